@@ -1,22 +1,64 @@
 # Create api.py to expose research functionality
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from sse_starlette.sse import EventSourceResponse
 import asyncio
 import json
+import os
+import time
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import uuid
 from contextlib import asynccontextmanager
 
+from openai import AsyncOpenAI
+from agents import add_trace_processor, custom_span, set_trace_processors, trace
+
+from backend.agents.graph import get_agent_graph
+from backend.client import create_model_client_from_env, pool_stats
+from backend.events import SessionEventBuffer
+from backend.model_control import ControlledModelProvider, create_model_provider
+from backend.timeline import ChromeTraceProcessor
+
 # Store active connections
 active_connections: Dict[str, List[WebSocket]] = {}
 # Store research results
 research_results: Dict[str, Any] = {}
+# Recent events of every session, replayed to SSE clients
+session_events = SessionEventBuffer(
+    max_events=int(os.environ.get("SESSION_EVENT_BUFFER_SIZE", 256)),
+    max_sessions=int(os.environ.get("SESSION_EVENT_MAX_SESSIONS", 10000)),
+)
+# Local per-job timelines, exported in Chrome trace format
+trace_processor = ChromeTraceProcessor()
+# Running research jobs by job ID, and the latest job of each session
+research_jobs: Dict[str, asyncio.Task] = {}
+session_jobs: Dict[str, str] = {}
+# Partial results saved by cancelled jobs
+research_checkpoints: Dict[str, str] = {}
+# Cancel a session's job once no client has watched it for this many seconds (unset: never)
+ABANDONED_JOB_GRACE_SECONDS = float(os.environ["ABANDONED_JOB_GRACE_SECONDS"]) if os.environ.get("ABANDONED_JOB_GRACE_SECONDS") else None
+abandon_timers: Dict[str, asyncio.Task] = {}
+# Model client and provider shared by all jobs, created in lifespan
+model_client: Optional[AsyncOpenAI] = None
+model_provider: Optional[ControlledModelProvider] = None
 
 # Middleware to handle the research manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Do nothing special
+    global model_client, model_provider
+    # Startup: One model client for the whole process, so every job reuses the same connection pool
+    model_client = create_model_client_from_env()
+    model_provider = create_model_provider(model_client)
+    # Warm up: import the research stack and wire the agent graph now, instead of on the first request
+    import backend.manager  # noqa: F401
+    get_agent_graph()
+    # Record traces locally. With LOCAL_TRACING_ONLY set, nothing is sent to the hosted trace viewer
+    if os.environ.get("LOCAL_TRACING_ONLY"):
+        set_trace_processors([trace_processor])
+    else:
+        add_trace_processor(trace_processor)
     yield
     # Shutdown: Close all connections
     for connection_list in active_connections.values():
@@ -25,6 +67,7 @@ async def lifespan(app: FastAPI):
                 await connection.close()
             except:
                 pass
+    await model_client.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -43,109 +86,315 @@ class QueryRequest(BaseModel):
     session_id: str
 
 
+class BatchRequest(BaseModel):
+    queries: List[str]
+    max_concurrency: int = 4
+
+
 @app.post("/api/research")
 async def start_research(query: QueryRequest):
     # Generate a unique job ID
     job_id = str(uuid.uuid4())
     
+    # A new query replaces whatever the session was still researching
+    previous_job = session_jobs.get(query.session_id)
+    if previous_job in research_jobs:
+        research_jobs[previous_job].cancel()
+    
     # Start research process in background
-    asyncio.create_task(run_research(query.text, query.session_id, job_id))
+    task = asyncio.create_task(run_research(query.text, query.session_id, job_id))
+    research_jobs[job_id] = task
+    session_jobs[query.session_id] = job_id
+    task.add_done_callback(lambda _: _forget_job(query.session_id, job_id))
+    # Nobody may ever connect (a scripted request, a tab that never opens its socket)
+    if not _has_clients(query.session_id):
+        schedule_abandon_check(query.session_id)
     
     return {"status": "started", "session_id": query.session_id, "job_id": job_id}
 
 
+def _forget_job(session_id: str, job_id: str):
+    research_jobs.pop(job_id, None)
+    if session_jobs.get(session_id) == job_id:
+        del session_jobs[session_id]
+
+
+@app.delete("/api/research/{job_id}")
+async def cancel_research(job_id: str):
+    """Cancel a running job. In-flight model calls are abandoned and partial results are checkpointed"""
+    task = research_jobs.get(job_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"No running job {job_id}")
+    task.cancel()
+    # Give the job a moment to save its checkpoint
+    await asyncio.wait([task], timeout=5)
+    return {"status": "cancelled", "job_id": job_id, "checkpoint": research_checkpoints.get(job_id)}
+
+
+def _has_clients(session_id: str) -> bool:
+    return bool(active_connections.get(session_id)) or session_events.has_subscribers(session_id)
+
+
+def schedule_abandon_check(session_id: str):
+    """Once the last client of a session leaves, cancel its job if nobody reconnects within the grace period"""
+    if ABANDONED_JOB_GRACE_SECONDS is None or session_jobs.get(session_id) not in research_jobs:
+        return
+
+    async def cancel_if_abandoned():
+        await asyncio.sleep(ABANDONED_JOB_GRACE_SECONDS)
+        abandon_timers.pop(session_id, None)
+        job_id = session_jobs.get(session_id)
+        if job_id in research_jobs and not _has_clients(session_id):
+            print(f"Cancelling job {job_id}: no clients for session {session_id} in {ABANDONED_JOB_GRACE_SECONDS}s")
+            research_jobs[job_id].cancel()
+
+    if session_id in abandon_timers:
+        abandon_timers[session_id].cancel()
+    abandon_timers[session_id] = asyncio.create_task(cancel_if_abandoned())
+
+
 async def run_research(query: str, session_id: str, job_id: str):
-    # Import here to avoid circular imports
+    # Import here to avoid circular imports (already loaded by the lifespan warm-up)
     from backend.manager import ResearchManager
     from backend.agents import AgentResponse, ClarificationRequest
     
     # Create a custom printer that will send updates via WebSocket
     manager = ResearchManager(
         printer_callback=lambda item, message, is_done=False: 
-            broadcast_progress(session_id, item, message, is_done)
+            broadcast_progress(session_id, item, message, is_done),
+        model_provider=model_provider,
     )
     
-    try:
-        # Run the research - pass the session_id
-        result = await manager.run(query, session_id=session_id)
-        
-        # Check if result is an AgentResponse with clarification_request
-        if isinstance(result, AgentResponse) and hasattr(result, 'clarification_request'):
-            # This case is handled within the manager.run() flow via request_clarification
-            # No need to store or broadcast as completion
-            return
-        
-        # Store the result only if it's not a clarification request
-        research_results[session_id] = result
-        
-        # Broadcast completion
-        await broadcast_completion(session_id, result)
-    except Exception as e:
-        # Log the error and broadcast it
-        print(f"Error in research process: {e}")
-        await broadcast_progress(session_id, "error", f"Research error: {str(e)}", is_done=True)
+    # Trace the whole job, including the final broadcasts, so its timeline can be exported
+    with trace(f"Research {session_id}", metadata={"job_id": job_id, "session_id": session_id}):
+        try:
+            # Run the research - pass the session_id
+            result = await manager.run(query, session_id=session_id)
+            
+            # Check if result is an AgentResponse with clarification_request
+            if isinstance(result, AgentResponse) and hasattr(result, 'clarification_request'):
+                # This case is handled within the manager.run() flow via request_clarification
+                # No need to store or broadcast as completion
+                return
+            
+            # Store the result only if it's not a clarification request
+            research_results[session_id] = result
+            
+            # Broadcast completion
+            await broadcast_completion(session_id, result)
+        except asyncio.CancelledError:
+            # Cancellation interrupts Runner.run and its in-flight model calls; keep what was gathered so far
+            print(f"Research job {job_id} cancelled")
+            research_checkpoints[job_id] = manager.save_checkpoint("cancelled")
+            await broadcast_progress(session_id, "cancelled", "Research cancelled", is_done=True)
+            raise
+        except Exception as e:
+            # Log the error and broadcast it
+            print(f"Error in research process: {e}")
+            await broadcast_progress(session_id, "error", f"Research error: {str(e)}", is_done=True)
+
+
+# Limits concurrent batch jobs across all batches, on top of each batch's own limit
+batch_slots = asyncio.Semaphore(int(os.environ.get("BATCH_MAX_CONCURRENCY", 8)))
+
+
+@app.post("/api/research/batch")
+async def start_research_batch(batch: BatchRequest):
+    """Research many queries, streaming each result back as an NDJSON line as soon as it finishes"""
+    batch_id = str(uuid.uuid4())
+    
+    # Identical queries (ignoring case and whitespace) are researched once and share the result
+    query_groups: Dict[str, List[int]] = {}
+    for index, text in enumerate(batch.queries):
+        query_groups.setdefault(" ".join(text.lower().split()), []).append(index)
+    batch_limit = asyncio.Semaphore(max(1, batch.max_concurrency))
+
+    async def run_group(indexes: List[int]):
+        async with batch_limit, batch_slots:
+            record = await run_batch_query(batch.queries[indexes[0]], batch_id)
+        return indexes, record
+
+    async def stream_results():
+        tasks = [asyncio.create_task(run_group(indexes)) for indexes in query_groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, record = await next_done
+                for index in indexes:
+                    line = {"batch_id": batch_id, "index": index, "query": batch.queries[index], **record}
+                    yield json.dumps(line) + "\n"
+        finally:
+            # Stop any remaining work if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Id": batch_id},
+    )
+
+
+async def run_batch_query(query: str, batch_id: str) -> Dict[str, Any]:
+    """Run one query of a batch without any connected client, returning its NDJSON record"""
+    # Batch jobs have nobody to ask, so clarification questions are answered automatically
+    from backend.manager import ResearchManager, auto_clarify
+
+    job_id = str(uuid.uuid4())
+    manager = ResearchManager(model_provider=model_provider, clarification_handler=auto_clarify, headless=True)
+    start = time.perf_counter()
+    with trace(f"Batch research {batch_id}", metadata={"job_id": job_id, "batch_id": batch_id}):
+        try:
+            report = await manager.run(query)
+            return {
+                "job_id": job_id,
+                "status": "complete",
+                "result": report.model_dump(),
+                "elapsed": round(time.perf_counter() - start, 3),
+            }
+        except Exception as e:
+            print(f"Error in batch research process: {e}")
+            return {
+                "job_id": job_id,
+                "status": "error",
+                "error": str(e),
+                "elapsed": round(time.perf_counter() - start, 3),
+            }
+
+
+@app.get("/api/stats")
+async def get_stats():
+    """Report the state of the shared model call controller, model router and connection pool"""
+    return {
+        "model_calls": model_provider.controller.stats(),
+        "model_routing": model_provider.router.stats() if model_provider.router else None,
+        "connection_pool": pool_stats(model_client),
+    }
+
+
+@app.get("/api/research/{job_id}/trace")
+async def get_research_trace(job_id: str):
+    """Download the timeline of a job in Chrome Trace Event format (open it in Perfetto)"""
+    chrome_trace = trace_processor.export_chrome_trace(job_id)
+    if chrome_trace is None:
+        raise HTTPException(status_code=404, detail=f"No trace recorded for job {job_id}")
+    return JSONResponse(
+        chrome_trace,
+        headers={"Content-Disposition": f'attachment; filename="research_{job_id}.trace.json"'},
+    )
 
 
 async def broadcast_progress(session_id: str, item: str, message: str, is_done: bool):
     """Send progress updates to all connected clients for this session"""
+    data = {
+        "session_id": session_id,
+        "type": "progress",
+        "item": item,
+        "message": message,
+        "is_done": is_done,
+        "sent_at": time.time()
+    }
+    # Buffer the event so SSE clients that connect (or reconnect) later can replay it
+    session_events.publish(session_id, data)
     if session_id in active_connections:
-        data = {
-            "session_id": session_id,
-            "type": "progress",
-            "item": item,
-            "message": message,
-            "is_done": is_done
-        }
-        for connection in active_connections[session_id]:
-            try:
-                await connection.send_text(json.dumps(data))
-            except:
-                pass  # Connection might be closed
+        with custom_span("broadcast_progress", data={"item": item, "connections": len(active_connections[session_id])}):
+            for connection in active_connections[session_id]:
+                try:
+                    await connection.send_text(json.dumps(data))
+                except:
+                    pass  # Connection might be closed
 
 
 async def broadcast_completion(session_id: str, result: Any):
     """Send the final result to all connected clients for this session"""
-    if session_id in active_connections:
-        # Handle different result types appropriately
-        try:
-            # First check if it's an AgentResponse with clarification request
-            from backend.agents import AgentResponse
-            if isinstance(result, AgentResponse) and hasattr(result, 'clarification_request'):
-                # This should be handled by request_clarification, not broadcast_completion
-                return
-                
-            # For report-like objects
-            if hasattr(result, 'report'):
-                result_data = {'report': result.report}
-                print(f"Sending report data: {result.report[:100]}...")  # Log the first 100 chars of report
-            # For objects with dictionary conversion
-            elif hasattr(result, 'to_dict'):
-                result_data = result.to_dict()
-                print(f"Sending dict data: {result_data}")
-            # For objects with dict representation
-            elif hasattr(result, '__dict__'):
-                result_data = result.__dict__
-                print(f"Sending __dict__ data: {result_data}")
-            # Fallback to string representation
-            else:
-                result_data = {'report': str(result)}
-                print(f"Sending string data: {result_data}")
-                
-            data = {
-                "session_id": session_id,
-                "type": "complete",
-                "result": result_data
-            }
+    # Handle different result types appropriately
+    try:
+        # First check if it's an AgentResponse with clarification request
+        from backend.agents import AgentResponse
+        if isinstance(result, AgentResponse) and hasattr(result, 'clarification_request'):
+            # This should be handled by request_clarification, not broadcast_completion
+            return
+            
+        # For report-like objects
+        if hasattr(result, 'report'):
+            result_data = {'report': result.report}
+            print(f"Sending report data: {result.report[:100]}...")  # Log the first 100 chars of report
+        # For objects with dictionary conversion
+        elif hasattr(result, 'to_dict'):
+            result_data = result.to_dict()
+            print(f"Sending dict data: {result_data}")
+        # For objects with dict representation
+        elif hasattr(result, '__dict__'):
+            result_data = result.__dict__
+            print(f"Sending __dict__ data: {result_data}")
+        # Fallback to string representation
+        else:
+            result_data = {'report': str(result)}
+            print(f"Sending string data: {result_data}")
             
+        data = {
+            "session_id": session_id,
+            "type": "complete",
+            "result": result_data,
+            "sent_at": time.time()
+        }
+        session_events.publish(session_id, data)
+        
+        if session_id in active_connections:
             print(f"Full completion data being sent: {data}")
             
-            for connection in active_connections[session_id]:
-                try:
-                    await connection.send_text(json.dumps(data))
-                except Exception as e:
-                    print(f"Error sending completion: {e}")
-        except Exception as e:
-            print(f"Error processing result for broadcast: {e}")
+            with custom_span("broadcast_completion", data={"connections": len(active_connections[session_id])}):
+                for connection in active_connections[session_id]:
+                    try:
+                        await connection.send_text(json.dumps(data))
+                    except Exception as e:
+                        print(f"Error sending completion: {e}")
+    except Exception as e:
+        print(f"Error processing result for broadcast: {e}")
+
+
+@app.get("/sse/{session_id}")
+async def sse_endpoint(request: Request, session_id: str, last_event_id: Optional[str] = None):
+    """Stream the events of a session as Server-Sent Events, replaying buffered events first.
+
+    Reconnecting clients resume after the `Last-Event-ID` header (or the `last_event_id` query parameter).
+    A stale id (from before a restart, or an evicted session) gets a `reset` event and a full replay.
+    """
+    last_event_id = request.headers.get("last-event-id") or last_event_id
+
+    async def event_stream():
+        last_seen = last_event_id
+        session_events.subscribe(session_id)
+        try:
+            while not await request.is_disconnected():
+                events, dropped, reset = session_events.since(session_id, last_seen)
+                if reset:
+                    # The client's position belongs to an earlier log; it gets the whole buffer again
+                    last_seen = None
+                    yield {"event": "reset", "data": json.dumps({"session_id": session_id, "dropped": dropped})}
+                elif dropped:
+                    # Tell the client it missed events that are no longer buffered
+                    yield {"event": "dropped", "data": json.dumps({"session_id": session_id, "count": dropped})}
+                for event_id, payload in events:
+                    yield {"id": event_id, "data": payload}
+                    last_seen = event_id
+                await session_events.wait(session_id, last_seen, timeout=15)
+        finally:
+            session_events.unsubscribe(session_id)
+            if not _has_clients(session_id):
+                schedule_abandon_check(session_id)
+
+    return EventSourceResponse(event_stream())
+
+
+class ClarificationResponse(BaseModel):
+    text: str
+
+
+@app.post("/api/sessions/{session_id}/clarification")
+async def submit_clarification(session_id: str, response: ClarificationResponse):
+    """Answer a clarification request, for clients that follow a session over SSE"""
+    await broadcast_clarification(session_id, response.text)
+    return {"status": "received", "session_id": session_id}
 
 
 @app.websocket("/ws/{session_id}")
@@ -205,6 +454,8 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
         active_connections[session_id].remove(websocket)
         if not active_connections[session_id]:
             del active_connections[session_id]
+            if not session_events.has_subscribers(session_id):
+                schedule_abandon_check(session_id)
 
 # Add new functions for clarification handling
 # Track agents waiting for clarification
@@ -236,7 +487,7 @@ async def broadcast_clarification(session_id: str, clarification: str):
 async def request_clarification(session_id: str, question: str) -> str:
     """Request clarification from the user and wait for response"""
     # Send clarification request to client
-    if session_id in active_connections:
+    if session_id in active_connections or session_events.has_subscribers(session_id):
         # Create an event to wait for the response
         waiting_for_clarification[session_id] = asyncio.Event()
         
@@ -261,14 +512,17 @@ async def request_clarification(session_id: str, question: str) -> str:
             is_done=False
         )
         
-        # Send to all connections for this session
-        success = False
-        for connection in active_connections[session_id]:
-            try:
-                await connection.send_text(json.dumps(data))
-                success = True
-            except Exception as e:
-                print(f"Error sending clarification request: {e}")
+        # Send to all connections for this session; SSE subscribers get it from the event buffer
+        session_events.publish(session_id, data)
+        success = session_events.has_subscribers(session_id)
+        connections = active_connections.get(session_id, [])
+        with custom_span("broadcast_clarification_request", data={"connections": len(connections)}):
+            for connection in connections:
+                try:
+                    await connection.send_text(json.dumps(data))
+                    success = True
+                except Exception as e:
+                    print(f"Error sending clarification request: {e}")
         
         if not success:
             return "Error: Could not send clarification request to any client"
@@ -6,6 +6,7 @@ from backend.agents.document_agent import document_agent, DocumentSummary
 from backend.agents.code_agent import code_agent, CodeSearchResult
 from backend.agents.reflection_agent import reflection_agent, ReflectionSummary
 from backend.agents.orchestrator_agent import orchestrator_agent, AgentResponse, ClarificationRequest
+from backend.agents.graph import AgentGraph, build_agent_graph, get_agent_graph
 
 __all__ = [
     "planner_agent",
@@ -20,5 +21,8 @@ __all__ = [
     "CodeSearchResult",
     "ReflectionSummary",
     "AgentResponse",
-    "ClarificationRequest"
+    "ClarificationRequest",
+    "AgentGraph",
+    "build_agent_graph",
+    "get_agent_graph"
 ]
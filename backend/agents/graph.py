@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from agents import Agent, AgentOutputSchema, handoff
+
+from backend.agents.planner_agent import planner_agent
+from backend.agents.search_agent import search_agent
+from backend.agents.writer_agent import writer_agent, writer_input_filter
+from backend.agents.document_agent import document_agent
+from backend.agents.code_agent import code_agent
+from backend.agents.reflection_agent import reflection_agent
+from backend.agents.orchestrator_agent import orchestrator_agent
+
+
+@dataclass(frozen=True)
+class AgentGraph:
+    """The wired agent system shared by every research job. Built once, never mutated."""
+    orchestrator: Agent[Any]
+    planner: Agent[Any]
+    search: Agent[Any]
+    writer: Agent[Any]
+    document: Agent[Any]
+    code: Agent[Any]
+    reflection: Agent[Any]
+
+
+def _prepare(agent: Agent[Any]) -> Agent[Any]:
+    """Copy an agent definition with its output schema built ahead of time.
+
+    The runner would otherwise rebuild the schema (and its pydantic validator) on every turn.
+    """
+    if agent.output_type is None or agent.output_type is str:
+        return agent.clone()
+    return agent.clone(output_type=AgentOutputSchema(agent.output_type))
+
+
+def build_agent_graph() -> AgentGraph:
+    """Wire copies of the agent definitions together, leaving the module-level agents untouched."""
+    orchestrator = _prepare(orchestrator_agent)
+    planner = _prepare(planner_agent)
+    search = _prepare(search_agent)
+    writer = _prepare(writer_agent)
+    document = _prepare(document_agent)
+    code = _prepare(code_agent)
+    reflection = _prepare(reflection_agent)
+
+    # we need orchestrator to handoff to all agents and each of the sub-agents should coordinate via orchestrator (handoff back to orchestrator)
+    # this way we can track the conversation history and the flow of the research
+    back_to_orchestrator = handoff(orchestrator)
+    for agent in (planner, search, writer, document, code):
+        agent.handoffs = [back_to_orchestrator]
+    orchestrator.handoffs = [
+        handoff(planner),
+        handoff(search),
+        # The writer gets the packed, consolidated findings instead of the raw research history
+        handoff(writer, input_filter=writer_input_filter),
+        handoff(document),
+        handoff(code),
+    ]
+
+    return AgentGraph(
+        orchestrator=orchestrator,
+        planner=planner,
+        search=search,
+        writer=writer,
+        document=document,
+        code=code,
+        reflection=reflection,
+    )
+
+
+_agent_graph: Optional[AgentGraph] = None
+
+
+def get_agent_graph() -> AgentGraph:
+    """Return the process-wide agent graph, building it on first use."""
+    global _agent_graph
+    if _agent_graph is None:
+        _agent_graph = build_agent_graph()
+    return _agent_graph
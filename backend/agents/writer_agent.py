@@ -1,14 +1,16 @@
 # Agent used to synthesize a final report from the individual summaries.
 from pydantic import BaseModel
 
-from agents import Agent
+from agents import Agent, HandoffInputData, function_tool
 
 PROMPT = (
     "You are a senior researcher tasked with writing a cohesive report for a research query. "
     "You will be provided with the original query, and research findings from various sources.\n"
     "Generate the report and return that as your final output.\n"
     "The final output should be in markdown format, and it should be detailed and comprehensive. "
-    "Include proper citations and references to sources where appropriate.\n\n"
+    "Include proper citations and references to sources where appropriate.\n"
+    "The research index lists every record gathered so far. The most relevant findings are included below it; "
+    "use the read_records tool to read the full records (for example code snippets) you need beyond those.\n\n"
     "If the research findings are incomplete or you need additional information to create a comprehensive report, "
     "don't hesitate to ask clarifying questions. For example, you might ask for more specific data on a particular aspect, "
     "or request additional research on a subtopic that seems underrepresented in the findings."
@@ -24,10 +26,53 @@ class ReportData(BaseModel):
 
 
 
+@function_tool
+def read_records(ids: list[str]) -> str:
+    """Read the full research records with the given ids from the research index.
+
+    Args:
+        ids: Record ids as listed in the research index, e.g. ["S2", "C1"].
+    """
+    from backend.blackboard import current_blackboard
+
+    blackboard = current_blackboard.get()
+    if blackboard is None:
+        return "No research records are available."
+    return blackboard.read(ids)
+
+
 writer_agent = Agent(
     name="WriterAgent",
     handoff_description="Specialist agent for synthesizing research findings into cohesive reports",
     instructions=PROMPT,
     model="gpt-4.1",
+    tools=[read_records],
     output_type=ReportData,
 )
+
+
+def writer_input_filter(handoff_data: HandoffInputData) -> HandoffInputData:
+    """Give the writer the research index and the most relevant findings, packed into its token budget."""
+    # Imported here, since these modules import the agent definitions
+    from backend.blackboard import current_blackboard, is_index_entry
+    from backend.packing import ContextPacker
+
+    blackboard = current_blackboard.get()
+    if blackboard is None or not blackboard.records:
+        return handoff_data
+
+    history = handoff_data.input_history
+    if isinstance(history, str):
+        history = ({"role": "user", "content": history},)
+    kept = tuple(item for item in history if not is_index_entry(item))
+    context = [blackboard.index_message()]
+    # Default selection: the findings and summaries that fit the budget, best first
+    if blackboard.findings.summaries or blackboard.findings.documents:
+        packed = ContextPacker().pack(blackboard.findings)
+        blackboard.findings.last_packing = packed
+        context.append(packed.text)
+    return HandoffInputData(
+        input_history=kept + ({"role": "user", "content": "\n\n".join(context)},),
+        pre_handoff_items=handoff_data.pre_handoff_items,
+        new_items=handoff_data.new_items,
+    )
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from backend.agents.code_agent import CodeSearchResult
+from backend.agents.document_agent import DocumentSummary
+from backend.agents.planner_agent import WebSearchPlan
+from backend.agents.search_agent import SearchResult
+from backend.sources import FindingsConsolidator, cite
+
+# Marks the index entry in the conversation history, so the previous one can be replaced
+# and the writer handoff can swap it for the records the writer needs
+INDEX_ENTRY_PREFIX = "[Research index]"
+
+# Record ids are a kind letter plus a running number, e.g. S2 is the second search
+ID_PREFIXES = {"plan": "P", "search": "S", "document": "D", "code": "C", "note": "N"}
+
+
+def _shorten(text: str, limit: int = 100) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+class Record(BaseModel):
+    id: str
+    """Short id the agents use to refer to the record, e.g. "S2"."""
+
+    kind: str
+    """One of "plan", "search", "document", "code" or "note"."""
+
+    agent: str
+    """Name of the agent that produced the record."""
+
+    title: str
+    """One line describing the record in the index."""
+
+    counts: Dict[str, int] = {}
+    """Sizes shown in the index, e.g. number of findings or snippets."""
+
+    data: Dict[str, Any]
+    """The full agent output."""
+
+    source_ids: List[int] = []
+    """Numbers of the record's sources in the consolidated source table."""
+
+    def index_line(self) -> str:
+        counts = ", ".join(f"{value} {name}" for name, value in self.counts.items())
+        return f"- {self.id} {self.kind} from {self.agent}: {self.title}" + (f" ({counts})" if counts else "")
+
+
+class Blackboard:
+    """Structured outputs of the agents of one research job.
+
+    Agent outputs are kept as records instead of being pasted into the conversation.
+    The orchestrator sees a compact index of them, and the writer reads the full records it needs.
+    """
+
+    def __init__(self, query: str = ""):
+        self.query = query
+        self.findings = FindingsConsolidator(query=query)
+        self.records: List[Record] = []
+        self._records_by_id: Dict[str, Record] = {}
+
+    def _next_id(self, kind: str) -> str:
+        count = sum(1 for record in self.records if record.kind == kind)
+        return f"{ID_PREFIXES[kind]}{count + 1}"
+
+    def post(self, agent: str, output: Any) -> Record:
+        """Store an agent output as a record, merging search results into the consolidated findings."""
+        source_ids: List[int] = []
+        if isinstance(output, SearchResult):
+            kind = "search"
+            new_findings = self.findings.add(output)
+            source_ids = sorted({self.findings.add_source(source) for source in output.sources})
+            title = _shorten(output.summary)
+            counts = {"findings": len(output.key_findings), "new": len(new_findings), "sources": len(source_ids)}
+        elif isinstance(output, DocumentSummary):
+            kind = "document"
+            self.findings.add_document(output)
+            title = f"{_shorten(output.title, 80)}, relevance {output.relevance_score:.2f}"
+            counts = {"key points": len(output.key_points)}
+        elif isinstance(output, CodeSearchResult):
+            kind = "code"
+            source_ids = sorted({self.findings.add_source(snippet.source) for snippet in output.snippets if snippet.source})
+            languages = sorted({snippet.language.lower() for snippet in output.snippets})
+            title = _shorten(output.summary) + (f" [{', '.join(languages)}]" if languages else "")
+            counts = {"snippets": len(output.snippets), "best practices": len(output.best_practices)}
+        elif isinstance(output, WebSearchPlan):
+            kind = "plan"
+            # The orchestrator acts on the planned searches, so they are listed in full
+            title = "; ".join(f'"{item.query}"' for item in output.searches)
+            counts = {"searches": len(output.searches)}
+        else:
+            kind = "note"
+            title = _shorten(output if isinstance(output, str) else json.dumps(output, default=str))
+            counts = {}
+
+        if isinstance(output, BaseModel):
+            data = output.model_dump()
+        elif isinstance(output, dict):
+            data = output
+        else:
+            data = {"text": str(output)}
+
+        record = Record(
+            id=self._next_id(kind),
+            kind=kind,
+            agent=agent,
+            title=title,
+            counts=counts,
+            data=data,
+            source_ids=source_ids,
+        )
+        self.records.append(record)
+        self._records_by_id[record.id] = record
+        return record
+
+    def get(self, record_id: str) -> Optional[Record]:
+        return self._records_by_id.get(record_id.strip().upper())
+
+    def index_message(self) -> str:
+        """Compact listing of every record, for the conversation history."""
+        lines = [
+            f"{INDEX_ENTRY_PREFIX} {len(self.records)} records so far, "
+            f"{len(self.findings.findings)} distinct findings from {len(self.findings.sources)} sources. "
+            "Full records are kept outside the conversation; the writer can read them by id.",
+        ]
+        lines.extend(record.index_line() for record in self.records)
+        return "\n".join(lines)
+
+    def read(self, record_ids: List[str]) -> str:
+        """Full text of the requested records, with their sources numbered as in the consolidated source table."""
+        parts = []
+        for record_id in record_ids:
+            record = self.get(record_id)
+            if record is None:
+                parts.append(f"{record_id}: no such record")
+                continue
+            part = f"{record.id} ({record.kind} from {record.agent}):\n{json.dumps(record.data, indent=1, default=str)}"
+            if record.source_ids:
+                sources = "\n".join(f"[{number}] {self.findings.sources[number - 1]}" for number in record.source_ids)
+                part += f"\nSources (cite as {cite(record.source_ids)}):\n{sources}"
+            parts.append(part)
+        return "\n\n".join(parts)
+
+
+def is_index_entry(item: Any) -> bool:
+    return isinstance(item, dict) and isinstance(item.get("content"), str) and item["content"].startswith(INDEX_ENTRY_PREFIX)
+
+
+# Blackboard of the research job running in the current task, read by the writer handoff and its tools
+current_blackboard: ContextVar[Optional[Blackboard]] = ContextVar("current_blackboard", default=None)
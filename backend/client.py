@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+
+def create_model_client(
+    max_connections: int = 200,
+    max_keepalive_connections: int = 50,
+    keepalive_expiry: float = 30.0,
+    connect_timeout: float = 5.0,
+) -> AsyncOpenAI:
+    """Create the process-wide model client, with one connection pool shared by every job.
+
+    Retries are left to the model call controller, so the client itself never retries.
+    """
+    http_client = DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(timeout=600, connect=connect_timeout),
+    )
+    return AsyncOpenAI(max_retries=0, http_client=http_client)
+
+
+def create_model_client_from_env() -> AsyncOpenAI:
+    return create_model_client(
+        max_connections=int(os.environ.get("MODEL_POOL_MAX_CONNECTIONS", 200)),
+        max_keepalive_connections=int(os.environ.get("MODEL_POOL_MAX_KEEPALIVE", 50)),
+        keepalive_expiry=float(os.environ.get("MODEL_POOL_KEEPALIVE_EXPIRY", 30.0)),
+    )
+
+
+def pool_stats(client: AsyncOpenAI) -> Dict[str, Any]:
+    """Report connection pool usage of a model client."""
+    # httpx does not expose pool statistics, so read them from the underlying httpcore pool
+    http_client: httpx.AsyncClient = client._client
+    pool = getattr(http_client._transport, "_pool", None)
+    if pool is None:
+        return {"available": False}
+
+    connections = list(pool.connections)
+    idle = sum(1 for connection in connections if connection.is_idle())
+    requests = list(getattr(pool, "_requests", []))
+    return {
+        "available": True,
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        # Requests waiting for a connection because the pool is at its limit
+        "queued_requests": sum(1 for request in requests if request.is_queued()),
+        "max_connections": getattr(pool, "_max_connections", None),
+        "max_keepalive_connections": getattr(pool, "_max_keepalive_connections", None),
+    }
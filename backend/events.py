@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class _SessionLog:
+    """Recent events of one session. Kept small, since thousands of these may be alive."""
+    __slots__ = ("epoch", "events", "next_id", "changed", "subscribers")
+
+    def __init__(self, max_events: int):
+        # Part of every event id, so ids from an earlier log (before a restart or eviction) are recognised
+        self.epoch = uuid.uuid4().hex[:8]
+        # (sequence number, JSON payload) pairs, oldest first
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=max_events)
+        self.next_id = 1
+        # Only allocated while somebody is waiting for new events
+        self.changed: Optional[asyncio.Event] = None
+        self.subscribers = 0
+
+
+class SessionEventBuffer:
+    """Bounded ring buffer of sequenced events per session, for replaying to late or reconnecting clients.
+
+    Each session keeps its last `max_events` events; the least recently used sessions without
+    subscribers are dropped once there are more than `max_sessions`. Event ids look like
+    "<epoch>-<sequence number>", where the epoch changes whenever a session's log is recreated.
+    """
+
+    def __init__(self, max_events: int = 256, max_sessions: int = 10000):
+        self.max_events = max_events
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, _SessionLog]" = OrderedDict()
+
+    def _log(self, session_id: str) -> _SessionLog:
+        log = self._sessions.get(session_id)
+        if log is None:
+            log = self._sessions[session_id] = _SessionLog(self.max_events)
+            self._evict(keep=session_id)
+        else:
+            self._sessions.move_to_end(session_id)
+        return log
+
+    def _evict(self, keep: str) -> None:
+        excess = len(self._sessions) - self.max_sessions
+        if excess <= 0:
+            return
+        # Sessions with connected subscribers, and the session being used (`keep`), are kept,
+        # even if that exceeds max_sessions
+        victims = []
+        for session_id, log in self._sessions.items():
+            if len(victims) >= excess:
+                break
+            if log.subscribers == 0 and session_id != keep:
+                victims.append(session_id)
+        for session_id in victims:
+            log = self._sessions.pop(session_id)
+            # Wake up anyone still waiting so they don't wait on a dropped log forever
+            if log.changed is not None:
+                log.changed.set()
+
+    def publish(self, session_id: str, data: Dict[str, Any]) -> str:
+        """Append an event to the session's buffer and wake up its subscribers. Returns the event id."""
+        log = self._log(session_id)
+        sequence = log.next_id
+        log.next_id += 1
+        log.events.append((sequence, json.dumps(data)))
+        if log.changed is not None:
+            log.changed.set()
+            log.changed = None
+        return f"{log.epoch}-{sequence}"
+
+    def _position(self, log: _SessionLog, last_event_id: Optional[str]) -> Tuple[int, bool]:
+        """Sequence number to resume after, and whether `last_event_id` came from another log."""
+        if not last_event_id:
+            return 0, False
+        epoch, _, sequence = last_event_id.rpartition("-")
+        if epoch != log.epoch or not sequence.isdigit() or int(sequence) >= log.next_id:
+            # Stale id (server restart, or the session was evicted and recreated): start over
+            return 0, True
+        return int(sequence), False
+
+    def since(self, session_id: str, last_event_id: Optional[str] = None) -> Tuple[List[Tuple[str, str]], int, bool]:
+        """Events after `last_event_id`, how many of those were already dropped from the buffer,
+        and whether `last_event_id` was stale, in which case the whole buffer is replayed."""
+        log = self._sessions.get(session_id)
+        if log is None:
+            return [], 0, False
+        position, reset = self._position(log, last_event_id)
+        events = [(f"{log.epoch}-{sequence}", payload) for sequence, payload in log.events if sequence > position]
+        first_available = log.events[0][0] if log.events else log.next_id
+        return events, max(0, first_available - position - 1), reset
+
+    def last_event_id(self, session_id: str) -> Optional[str]:
+        log = self._sessions.get(session_id)
+        return f"{log.epoch}-{log.next_id - 1}" if log is not None and log.next_id > 1 else None
+
+    async def wait(self, session_id: str, last_event_id: Optional[str], timeout: Optional[float] = None) -> None:
+        """Wait until the session has an event newer than `last_event_id` (or the timeout passes)."""
+        log = self._log(session_id)
+        position, reset = self._position(log, last_event_id)
+        if reset or log.next_id - 1 > position:
+            return
+        if log.changed is None:
+            log.changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(log.changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def subscribe(self, session_id: str) -> None:
+        self._log(session_id).subscribers += 1
+
+    def unsubscribe(self, session_id: str) -> None:
+        log = self._sessions.get(session_id)
+        if log is not None:
+            log.subscribers = max(0, log.subscribers - 1)
+
+    def has_subscribers(self, session_id: str) -> bool:
+        log = self._sessions.get(session_id)
+        return log is not None and log.subscribers > 0
@@ -1,15 +1,44 @@
+import argparse
 import asyncio
-import os
 import json
-from manager import ResearchManager
+import os
+import re
+import statistics
+import sys
+import time
+from typing import List, Optional
 
 
-async def main() -> None:
-    # Ensure OpenAI API key is set
-    if not os.environ.get("OPENAI_API_KEY"):
-        print("Please set the OPENAI_API_KEY environment variable.")
-        print("Example: export OPENAI_API_KEY=sk-...")
-        return
+def _slugify(text: str, max_length: int = 60) -> str:
+    slug = re.sub(r"[^a-zA-Z0-9]+", "_", text).strip("_").lower()
+    return slug[:max_length] or "query"
+
+
+def _write_report(query: str, report, output_dir: str, output_format: str, index: Optional[int] = None) -> str:
+    """Write a report to its own file and return the path."""
+    os.makedirs(output_dir, exist_ok=True)
+    name = _slugify(query) if index is None else f"{index:04d}_{_slugify(query)}"
+    report_path = os.path.join(output_dir, f"{name}.{output_format}")
+    with open(report_path, "w") as f:
+        if output_format == "json":
+            json.dump({"query": query, **report.model_dump()}, f, indent=2)
+        else:
+            f.write(f"# {query}\n\n{report.short_summary}\n\n{report.report}\n")
+    return report_path
+
+
+def _read_queries(path: str) -> List[str]:
+    """One query per line, from a file or stdin ("-"). Blank lines and # comments are skipped."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith("#")]
+
+
+async def run_interactive(output_dir: str, output_format: str) -> None:
+    from backend.manager import ResearchManager
 
     print("🔍 Personal Research Agent 🔍")
     print("----------------------------")
@@ -17,20 +46,80 @@ async def main() -> None:
     print("Agents include: PlannerAgent, SearchAgent, WriterAgent, DocumentAgent, CodeAgent, and more.")
     print("All agents work together through an orchestrator to provide comprehensive research.")
     print("\n")
-    
+
     query = input("What would you like to research? ")
     manager = ResearchManager()
     report = await manager.run(query)
 
-    os.makedirs("output_reports", exist_ok=True)
-    report_path = os.path.join("output_reports", f"{query}.md")
-    with open(report_path, "w") as f:
-        json.dump(report, f, indent=2)
-    
+    report_path = _write_report(query, report, output_dir, output_format)
+
     print("\n")
+    print(f"Report saved to: {report_path}")
     print("Research session complete! You can find a trace of the agent interactions in the URL above.")
     print("Try another query or explore the agent capabilities further.")
 
 
+async def run_batch(queries: List[str], parallel: int, output_dir: str, output_format: str) -> None:
+    """Research all queries concurrently without a terminal UI, writing one report file per query."""
+    from backend.manager import ResearchManager, auto_clarify
+
+    slots = asyncio.Semaphore(max(1, parallel))
+    latencies: List[float] = []
+    failures = 0
+
+    async def research(index: int, query: str) -> None:
+        nonlocal failures
+        async with slots:
+            start = time.perf_counter()
+            try:
+                manager = ResearchManager(clarification_handler=auto_clarify, headless=True)
+                report = await manager.run(query)
+                report_path = _write_report(query, report, output_dir, output_format, index)
+                latencies.append(time.perf_counter() - start)
+                print(f"[{index}] done in {latencies[-1]:.1f}s: {report_path}")
+            except Exception as e:
+                failures += 1
+                print(f"[{index}] failed after {time.perf_counter() - start:.1f}s: {e}")
+
+    print(f"Researching {len(queries)} queries, {parallel} at a time...")
+    start = time.perf_counter()
+    await asyncio.gather(*(research(index, query) for index, query in enumerate(queries, 1)))
+    elapsed = time.perf_counter() - start
+
+    print("\n----------------------------")
+    print(f"Completed: {len(latencies)}  Failed: {failures}  Wall time: {elapsed:.1f}s")
+    print(f"Throughput: {len(latencies) / elapsed * 60:.1f} reports/min")
+    if latencies:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        print(
+            f"Latency: p50 {statistics.median(latencies):.1f}s  p95 {cuts[94]:.1f}s  "
+            f"max {max(latencies):.1f}s  mean {statistics.mean(latencies):.1f}s"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Personal Research Agent")
+    parser.add_argument("--queries", help="file with one query per line, or - for stdin; runs without prompting")
+    parser.add_argument("--parallel", type=int, default=4, help="number of queries researched at once (batch mode)")
+    parser.add_argument("--format", choices=["md", "json"], default="md", help="report file format")
+    parser.add_argument("--output-dir", default="output_reports", help="directory for the report files")
+    args = parser.parse_args()
+
+    # Ensure OpenAI API key is set
+    if not os.environ.get("OPENAI_API_KEY"):
+        print("Please set the OPENAI_API_KEY environment variable.")
+        print("Example: export OPENAI_API_KEY=sk-...")
+        return
+
+    if args.queries:
+        queries = _read_queries(args.queries)
+        if not queries:
+            print("No queries to research.")
+            return
+        asyncio.run(run_batch(queries, args.parallel, args.output_dir, args.format))
+    else:
+        asyncio.run(run_interactive(args.output_dir, args.format))
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -3,73 +3,113 @@ from __future__ import annotations
 import time
 import os
 import json
+import io
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Callable, Optional, Any, List, Dict
+from typing import Awaitable, Callable, Optional, Any, List, Dict
 
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
-from openai.types.responses import ResponseContentPartDoneEvent, ResponseTextDeltaEvent
 
-from agents import Runner, custom_span, gen_trace_id, trace, RawResponsesStreamEvent, TResponseInputItem
+from agents import ModelProvider, RunConfig, Runner, custom_span, gen_trace_id, get_current_trace, trace, TResponseInputItem
 
-from backend.agents.planner_agent import planner_agent
-from backend.agents.search_agent import search_agent
-from backend.agents.writer_agent import writer_agent, ReportData
-from backend.agents.document_agent import document_agent
-from backend.agents.code_agent import code_agent
-from backend.agents.reflection_agent import reflection_agent, ReflectionSummary
-from backend.agents.orchestrator_agent import orchestrator_agent
+from backend.agents.writer_agent import ReportData
+from backend.agents.reflection_agent import ReflectionSummary
+from backend.agents.graph import get_agent_graph
 from backend.agents import AgentResponse
+from backend.model_control import get_model_provider
 from backend.printer import Printer
+from backend.blackboard import Blackboard, current_blackboard, is_index_entry
+from backend.routing import JobProfile, current_job_profile
+
+# Answer given to clarification questions when nobody is there to answer them (batch runs)
+AUTO_CLARIFICATION_ANSWER = "No clarification is available. Proceed with the most reasonable interpretation of the query."
+
+
+async def auto_clarify(question: str) -> str:
+    """Clarification handler for unattended runs."""
+    return AUTO_CLARIFICATION_ANSWER
+
+
+class _DiscardedOutput(io.StringIO):
+    """Terminal output of headless runs: written to nowhere, without holding a file handle open."""
+
+    def write(self, text: str) -> int:
+        return len(text)
+
 
 class ResearchManager:
-    def __init__(self, printer_callback: Optional[Callable[[str, str, bool], Any]] = None):
-        self.console = Console(record=True)  # Enable recording by default
+    def __init__(
+        self,
+        printer_callback: Optional[Callable[[str, str, bool], Any]] = None,
+        model_provider: Optional[ModelProvider] = None,
+        clarification_handler: Optional[Callable[[str], Awaitable[str]]] = None,
+        headless: bool = False,
+    ):
+        # Headless runs still record the session log, but don't draw anything on the terminal
+        self.console = Console(record=True, file=_DiscardedOutput() if headless else None)  # Enable recording by default
         self.printer = Printer(self.console, callback=printer_callback)
         
-        # Configure agent handoffs
-        self._configure_agent_system()
+        # Answers the orchestrator's clarification questions; defaults to the session's WebSocket or the console
+        self.clarification_handler = clarification_handler
+        
+        # All model calls go through the shared controller (concurrency limits, retries, rate limits)
+        self.run_config = RunConfig(model_provider=model_provider or get_model_provider())
+        
+        # The agent system is wired once per process and shared by all jobs
+        self.agents = get_agent_graph()
         
         # Store the current session ID
         self.session_id = None
         # Store timestamp for the session
         self.timestamp = None
-
-    def _configure_agent_system(self):
-        """Configure the agent system with proper handoffs."""
-        # Set up handoffs for the orchestrator agent
-        orchestrator_agent.handoffs = [
-            planner_agent,
-            search_agent,
-            writer_agent,
-            document_agent,
-            code_agent
-        ]
-        
-        # we need orchestrator to handoff to all agents and each of the sub-agents should coordinate via orchestrator (handoff back to orchestrator)
-        # this way we can track the conversation history and the flow of the research
-        planner_agent.handoffs = [orchestrator_agent]
-        search_agent.handoffs = [orchestrator_agent]
-        writer_agent.handoffs = [orchestrator_agent]
-        document_agent.handoffs = [orchestrator_agent]
-        code_agent.handoffs = [orchestrator_agent]
+        # Structured agent outputs and consolidated findings of the current run
+        self.blackboard = Blackboard()
+        # Conversation with the orchestrator of the current run
+        self.conversation_history: List[TResponseInputItem] = []
 
     async def run(self, query: str, session_id: Optional[str] = None) -> ReportData:
         self.session_id = session_id  # Store the session ID for this run
-        conversation_id = gen_trace_id()
-        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microseconds keep the log files of concurrent runs apart
+        self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         
         # Reset the console recording
         self.console.record = True
         
-        with trace(f"Research {session_id}", trace_id=conversation_id):
-            self.printer.update_item(
-                "trace_id",
-                f"View trace: https://platform.openai.com/traces/trace?trace_id={conversation_id}",
-                is_done=True,
-                hide_checkmark=True,
-            )
+        # Agent outputs are posted to the blackboard as they arrive; the writer handoff reads it from the context.
+        # Every job runs in its own task, so the context variable doesn't leak between jobs
+        self.blackboard = Blackboard(query=query)
+        current_blackboard.set(self.blackboard)
+        # Read by the model router to pick the model tier of each call
+        self.profile = JobProfile(query)
+        current_job_profile.set(self.profile)
+        
+        # Join the caller's trace if there is one (the API traces the whole job), otherwise start our own
+        current_trace = get_current_trace()
+        job_id = None
+        if current_trace is not None:
+            conversation_id = current_trace.trace_id
+            job_id = (getattr(current_trace, "metadata", None) or {}).get("job_id")
+            research_trace = nullcontext()
+        else:
+            conversation_id = gen_trace_id()
+            research_trace = trace(f"Research {session_id}", trace_id=conversation_id)
+
+        with research_trace:
+            # API jobs have a local timeline; the hosted trace only exists if traces are exported
+            trace_links = []
+            if job_id:
+                trace_links.append(f"Timeline: /api/research/{job_id}/trace")
+            if not os.environ.get("LOCAL_TRACING_ONLY"):
+                trace_links.append(f"View trace: https://platform.openai.com/traces/trace?trace_id={conversation_id}")
+            if trace_links:
+                self.printer.update_item(
+                    "trace_id",
+                    "\n".join(trace_links),
+                    is_done=True,
+                    hide_checkmark=True,
+                )
 
             self.printer.update_item(
                 "starting",
@@ -84,21 +124,24 @@ class ResearchManager:
             
             # Track the conversation for interactive clarifications
             conversation_history = inputs.copy()
+            self.conversation_history = conversation_history
             
             # Continue the conversation until we get a final report
             report = None
             while report is None:
+                self.profile.turn += 1
                 # Stream the agent process
                 result = await Runner.run(
-                    orchestrator_agent,
+                    self.agents.orchestrator,
                     input=conversation_history,
+                    run_config=self.run_config,
                 )
                 
                 # Log full agent response to console for debugging
                 self.console.print(f"\n[dim blue]===== RESPONSE =====\n{result}\n==================================[/dim blue]")
                 
                 # Check if the agent is asking for clarification
-                if result.last_agent == orchestrator_agent:
+                if result.last_agent is self.agents.orchestrator:
                     try:
                         agent_response = result.final_output_as(AgentResponse)
                         
@@ -126,7 +169,9 @@ class ResearchManager:
                                 )
                                 
                                 # Get user input via WebSocket if session_id is available, otherwise fallback to console
-                                if self.session_id:
+                                if self.clarification_handler:
+                                    user_input = await self.clarification_handler(formatted_question)
+                                elif self.session_id:
                                     # Import here to avoid circular imports
                                     from api import request_clarification
                                     user_input = await request_clarification(self.session_id, formatted_question)
@@ -165,6 +210,13 @@ class ResearchManager:
                         "Report has been generated",
                         is_done=True,
                     )
+                    
+                    # Report what the writer was given, and what didn't fit its context budget
+                    packing = self.blackboard.findings.last_packing
+                    if packing is not None:
+                        self.printer.update_item("context_packing", packing.summary_message(), is_done=True)
+                        for item in packing.dropped:
+                            self.console.log(f"Dropped from writer context ({item.kind}, score {item.score:.2f}): {item.text[:120]}")
                 else:
                     self.printer.update_item(
                         "agent_processing",
@@ -172,17 +224,13 @@ class ResearchManager:
                         is_done=True,
                     )
 
-                    # Add the response to conversation history - convert to string to avoid JSON issues
-                    if isinstance(result.final_output, dict):
-                        conversation_history.append({"role": "assistant", "content": json.dumps(result.final_output)})
-                    else:
-                        try:
-                            # Try to convert to a simple string representation
-                            content = str(result.final_output)
-                            conversation_history.append({"role": "assistant", "content": content})
-                        except Exception as e:
-                            self.console.log(f"Error converting response to string: {e}")
-                            conversation_history.append({"role": "assistant", "content": "Response processed but not added to history due to serialization error"})
+                    # Keep the output on the blackboard; the orchestrator only gets the updated index of records
+                    record = self.blackboard.post(result.last_agent.name, result.final_output)
+                    self.console.log(f"Posted {record.id} ({record.kind}) to the blackboard")
+                    if record.kind == "search":
+                        self.printer.update_item("consolidation", self.blackboard.findings.stats_message(), is_done=True)
+                    conversation_history[:] = [item for item in conversation_history if not is_index_entry(item)]
+                    conversation_history.append({"role": "assistant", "content": self.blackboard.index_message()})
 
                     conversation_history.append({"role": "user", "content": f"Continue with the research given the output of {result.last_agent.name}"})
                     
@@ -203,6 +251,26 @@ class ResearchManager:
             
             return report
     
+    def save_checkpoint(self, reason: str) -> str:
+        """Save what the current run gathered so far (e.g. when it is cancelled) and return the file path."""
+        checkpoint = {
+            "query": self.blackboard.query,
+            "session_id": self.session_id,
+            "reason": reason,
+            "saved_at": datetime.now().isoformat(),
+            "sources": self.blackboard.findings.sources,
+            "findings": [finding.model_dump() for finding in self.blackboard.findings.findings],
+            "records": [record.model_dump() for record in self.blackboard.records],
+            "conversation_history": self.conversation_history,
+        }
+        os.makedirs("output_logs", exist_ok=True)
+        checkpoint_filename = f"output_logs/checkpoint_{self.timestamp}.json"
+        with open(checkpoint_filename, "w") as f:
+            json.dump(checkpoint, f, indent=2, default=str)
+        
+        self.console.print(f"[yellow]Partial results saved to: [bold]{checkpoint_filename}[/bold][/yellow]")
+        return checkpoint_filename
+
     def _save_session_to_html(self, query: str):
         """Save the current console recording to an HTML file."""
         os.makedirs("output_logs", exist_ok=True)
@@ -227,8 +295,9 @@ class ResearchManager:
                 ])
                 
                 result = await Runner.run(
-                    reflection_agent,
+                    self.agents.reflection,
                     f"Original query: {query}\nReport summary: {report.short_summary}\nFollow-up questions: {report.follow_up_questions}\nConversation history: {conversation_str}",
+                    run_config=self.run_config,
                 )
                 # Log the reflection results for future reference
                 reflection_summary = result.final_output_as(ReflectionSummary)
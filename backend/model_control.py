@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Deque, Dict, Optional, Set
+
+import openai
+from agents import (
+    AgentSpanData,
+    Model,
+    ModelProvider,
+    ModelResponse,
+    ModelSettings,
+    ModelTracing,
+    OpenAIProvider,
+    get_current_span,
+)
+
+from backend.client import create_model_client_from_env
+
+if TYPE_CHECKING:
+    from backend.routing import ModelRouter
+
+# Errors that are worth retrying; everything else is surfaced to the caller immediately
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+# Errors that mean the provider is overloaded, and that concurrency should back off
+OVERLOAD_ERRORS = (openai.RateLimitError, openai.APITimeoutError)
+
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token estimate (~4 characters per token) for rate limiting before a call is made."""
+    if value is None:
+        return 0
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // 4 + 1
+
+
+def current_agent_name() -> Optional[str]:
+    """Name of the agent whose turn is running, from the runner's agent span (set even with tracing disabled)."""
+    span = get_current_span()
+    if span is not None and isinstance(span.span_data, AgentSpanData):
+        return span.span_data.name
+    return None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the retry-after hint of a provider error, if it has one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class AIMDLimiter:
+    """Concurrency limit that grows additively on success and halves when the provider is overloaded."""
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        # A burst of 429s from the same window should only count as one overload signal
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now."""
+        if self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    async def release(self, success: bool = True, overloaded: bool = False) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif success:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class TokenRateLimiter:
+    """Token bucket shared by all model calls, refilled at `tokens_per_minute`."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.rate = tokens_per_minute / 60
+        self._updated = time.monotonic()
+        # Waiters queue on the lock, so they are served in order
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Correct a reservation once the real usage is known (the bucket may go into debt)."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + reserved - used)
+
+
+class HedgingPolicy:
+    """Decides when a slow call gets a duplicate ("hedged") request.
+
+    Tracks a rolling window of call latencies per agent. Once a call of a hedged agent has run
+    longer than the agent's latency percentile, a duplicate is sent, unless that would push the
+    number of hedges above `budget` (a fraction of all calls of hedged agents).
+    """
+
+    def __init__(
+        self,
+        agents: Set[str],
+        budget: float = 0.05,
+        percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.agents = agents
+        self.budget = budget
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, agent: str, seconds: float) -> None:
+        if agent not in self.latencies:
+            self.latencies[agent] = deque(maxlen=self.window)
+        self.latencies[agent].append(seconds)
+
+    def threshold(self, agent: str) -> Optional[float]:
+        """The agent's latency percentile, or None until enough calls have been seen."""
+        samples = self.latencies.get(agent)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+
+    def hedge_delay(self, agent: Optional[str], count: bool = True) -> Optional[float]:
+        """How long to wait before hedging a call of this agent, or None to never hedge it.
+
+        `count=False` is for repeats of a call that was already counted (e.g. an escalation),
+        so they don't raise the hedge budget.
+        """
+        if agent not in self.agents:
+            return None
+        if count:
+            self.calls += 1
+        return self.threshold(agent)
+
+    def can_hedge(self) -> bool:
+        return self.hedges + 1 <= self.budget * self.calls
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "budget": self.budget,
+            "thresholds": {
+                agent: round(threshold, 3)
+                for agent in self.latencies
+                if (threshold := self.threshold(agent)) is not None
+            },
+        }
+
+
+class ModelCallController:
+    """Shared controller that every model call passes through.
+
+    It keeps an AIMD concurrency limit per model, retries transient provider errors with
+    jittered exponential backoff (honouring retry-after), applies a global token rate limit,
+    and hedges slow calls of the agents named by its HedgingPolicy.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        initial_concurrency: int = 8,
+        max_concurrency: int = 64,
+        tokens_per_minute: Optional[int] = None,
+        hedging: Optional[HedgingPolicy] = None,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.token_limiter = TokenRateLimiter(tokens_per_minute) if tokens_per_minute else None
+        self.limiters: Dict[str, AIMDLimiter] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.hedging = hedging
+
+    @classmethod
+    def from_env(cls) -> "ModelCallController":
+        tokens_per_minute = os.environ.get("MODEL_TOKENS_PER_MINUTE")
+        hedge_agents = os.environ.get("MODEL_HEDGE_AGENTS", "SearchAgent,DocumentAgent")
+        hedge_budget = float(os.environ.get("MODEL_HEDGE_BUDGET", 0.05))
+        hedging = None
+        if hedge_agents and hedge_budget > 0:
+            hedging = HedgingPolicy(
+                agents={name.strip() for name in hedge_agents.split(",") if name.strip()},
+                budget=hedge_budget,
+                percentile=float(os.environ.get("MODEL_HEDGE_PERCENTILE", 0.95)),
+            )
+        return cls(
+            max_retries=int(os.environ.get("MODEL_MAX_RETRIES", 5)),
+            initial_concurrency=int(os.environ.get("MODEL_INITIAL_CONCURRENCY", 8)),
+            max_concurrency=int(os.environ.get("MODEL_MAX_CONCURRENCY", 64)),
+            tokens_per_minute=int(tokens_per_minute) if tokens_per_minute else None,
+            hedging=hedging,
+        )
+
+    def limiter(self, model_name: str) -> AIMDLimiter:
+        if model_name not in self.limiters:
+            self.limiters[model_name] = AIMDLimiter(
+                initial=self.initial_concurrency, maximum=self.max_concurrency
+            )
+            self.counters[model_name] = {"calls": 0, "retries": 0, "overloaded": 0, "failures": 0}
+        return self.limiters[model_name]
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the provider's retry-after."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def call(
+        self,
+        model_name: str,
+        make_call: Callable[[], Awaitable[ModelResponse]],
+        estimated_tokens: int = 0,
+        agent: Optional[str] = None,
+        repeat: bool = False,
+    ) -> ModelResponse:
+        limiter = self.limiter(model_name)
+        counters = self.counters[model_name]
+        counters["calls"] += 1
+        hedge_delay = self.hedging.hedge_delay(agent, count=not repeat) if self.hedging else None
+
+        for attempt in range(self.max_retries + 1):
+            if self.token_limiter:
+                await self.token_limiter.acquire(estimated_tokens)
+            await limiter.acquire()
+            start = time.monotonic()
+            try:
+                if hedge_delay is None:
+                    response = await make_call()
+                else:
+                    response = await self._hedged_call(model_name, make_call, agent, hedge_delay)
+            except RETRYABLE_ERRORS as e:
+                overloaded = isinstance(e, OVERLOAD_ERRORS)
+                await limiter.release(success=False, overloaded=overloaded)
+                if self.token_limiter:
+                    self.token_limiter.settle(estimated_tokens, 0)
+                if overloaded:
+                    counters["overloaded"] += 1
+                if attempt == self.max_retries:
+                    counters["failures"] += 1
+                    raise
+                counters["retries"] += 1
+                delay = self.backoff_delay(attempt, retry_after_seconds(e))
+                print(f"Model call to {model_name} failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            except asyncio.CancelledError:
+                # Abandoned (e.g. a cancelled job), not a provider failure
+                await limiter.release(success=False)
+                if self.token_limiter:
+                    self.token_limiter.settle(estimated_tokens, 0)
+                raise
+            except BaseException:
+                await limiter.release(success=False)
+                counters["failures"] += 1
+                raise
+
+            await limiter.release(success=True)
+            if self.token_limiter:
+                self.token_limiter.settle(estimated_tokens, response.usage.total_tokens)
+            if self.hedging and agent in self.hedging.agents:
+                # Time spent at the provider only, so queueing for a slot doesn't trigger hedges
+                self.hedging.record(agent, time.monotonic() - start)
+            return response
+
+        raise AssertionError("unreachable")
+
+    async def _hedged_call(
+        self,
+        model_name: str,
+        make_call: Callable[[], Awaitable[ModelResponse]],
+        agent: str,
+        delay: float,
+    ) -> ModelResponse:
+        """Send the call, and a duplicate if it is still running after `delay`; the first response wins."""
+        limiter = self.limiters[model_name]
+        primary = asyncio.ensure_future(make_call())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            # Hedge only within the budget, and only with a free slot: duplicating queued calls doesn't help
+            if done or not self.hedging.can_hedge() or not limiter.try_acquire():
+                return await primary
+
+            self.hedging.hedges += 1
+            print(f"{agent} call to {model_name} still running after {delay:.1f}s, sending a hedged request")
+            hedge = asyncio.ensure_future(self._send_hedge(limiter, make_call))
+            done, pending = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if task.exception() is None]
+            if not succeeded and pending:
+                # The first one failed; the other may still succeed
+                await asyncio.wait(pending)
+                succeeded = [task for task in pending if task.exception() is None]
+            if not succeeded:
+                # Both failed (every exception has been retrieved above); surface the primary's
+                return primary.result()
+            # Both may have finished in the same wakeup; either response will do
+            winner = primary if primary in succeeded else succeeded[0]
+            if winner is hedge:
+                self.hedging.hedge_wins += 1
+            return winner.result()
+        finally:
+            # Cancel the loser (or both, if this call itself was cancelled)
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @staticmethod
+    async def _send_hedge(limiter: AIMDLimiter, make_call: Callable[[], Awaitable[ModelResponse]]) -> ModelResponse:
+        """The duplicate request, holding its own concurrency slot."""
+        try:
+            response = await make_call()
+        except OVERLOAD_ERRORS:
+            await limiter.release(success=False, overloaded=True)
+            raise
+        except BaseException:
+            await limiter.release(success=False)
+            raise
+        await limiter.release(success=True)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        models = {
+            name: {
+                "concurrency_limit": round(limiter.limit, 2),
+                "in_flight": limiter.in_flight,
+                **self.counters[name],
+            }
+            for name, limiter in self.limiters.items()
+        }
+        stats: Dict[str, Any] = {"models": models}
+        if self.hedging:
+            stats["hedging"] = self.hedging.stats()
+        if self.token_limiter:
+            self.token_limiter._refill()
+            stats["tokens_available"] = int(self.token_limiter.tokens)
+        return stats
+
+
+class ControlledModel(Model):
+    """Model wrapper that routes every call through a ModelCallController.
+
+    `repeat` marks calls that redo an earlier call (see backend.routing), so they aren't counted again.
+    """
+
+    def __init__(self, model: Model, model_name: str, controller: ModelCallController, repeat: bool = False):
+        self.model = model
+        self.model_name = model_name
+        self.controller = controller
+        self.repeat = repeat
+
+    async def get_response(
+        self,
+        system_instructions,
+        input,
+        model_settings: ModelSettings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing: ModelTracing,
+        *,
+        previous_response_id,
+    ) -> ModelResponse:
+        return await self.controller.call(
+            self.model_name,
+            lambda: self.model.get_response(
+                system_instructions,
+                input,
+                model_settings,
+                tools,
+                output_schema,
+                handoffs,
+                tracing,
+                previous_response_id=previous_response_id,
+            ),
+            estimated_tokens=estimate_tokens(system_instructions) + estimate_tokens(input),
+            agent=current_agent_name(),
+            repeat=self.repeat,
+        )
+
+    async def stream_response(
+        self,
+        system_instructions,
+        input,
+        model_settings: ModelSettings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing: ModelTracing,
+        *,
+        previous_response_id,
+    ) -> AsyncIterator[Any]:
+        # Streams hold a concurrency slot for their whole duration but are not retried,
+        # since events may already have been consumed
+        limiter = self.controller.limiter(self.model_name)
+        await limiter.acquire()
+        success = False
+        try:
+            async for event in self.model.stream_response(
+                system_instructions,
+                input,
+                model_settings,
+                tools,
+                output_schema,
+                handoffs,
+                tracing,
+                previous_response_id=previous_response_id,
+            ):
+                yield event
+            success = True
+        except OVERLOAD_ERRORS:
+            await limiter.release(success=False, overloaded=True)
+            raise
+        except BaseException:
+            await limiter.release(success=False)
+            raise
+        await limiter.release(success=success)
+
+
+class ControlledModelProvider(ModelProvider):
+    """Model provider that wraps the models of another provider in a shared controller.
+
+    With a router (see backend.routing), the model tier of each call is picked per call.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[ModelProvider] = None,
+        controller: Optional[ModelCallController] = None,
+        router: Optional["ModelRouter"] = None,
+    ):
+        self.provider = provider or OpenAIProvider()
+        self.controller = controller or ModelCallController.from_env()
+        self.router = router
+
+    def _controlled_model(self, model_name: Optional[str], repeat: bool = False) -> Model:
+        model = self.provider.get_model(model_name)
+        return ControlledModel(model, model_name or "default", self.controller, repeat=repeat)
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        if self.router is not None and self.router.can_route(model_name):
+            from backend.routing import RoutedModel
+
+            return RoutedModel(model_name, self._controlled_model, self.router)
+        return self._controlled_model(model_name)
+
+
+def create_model_provider(client: openai.AsyncOpenAI) -> ControlledModelProvider:
+    """Provider for all agents, sharing one client (and connection pool), one controller and one router."""
+    # Imported here, since routing builds on this module
+    from backend.routing import ModelRouter
+
+    return ControlledModelProvider(OpenAIProvider(openai_client=client), router=ModelRouter.from_env())
+
+
+# Process-wide provider for callers that don't inject their own (e.g. the CLI)
+_model_provider: Optional[ControlledModelProvider] = None
+
+
+def get_model_provider() -> ControlledModelProvider:
+    global _model_provider
+    if _model_provider is None:
+        _model_provider = create_model_provider(create_model_client_from_env())
+    return _model_provider
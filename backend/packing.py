@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import math
+import os
+from collections import Counter
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from backend.model_control import estimate_tokens
+from backend.sources import FindingsConsolidator, cite, tokenize
+
+
+class ContextItem(BaseModel):
+    kind: str
+    """One of "document", "finding" or "summary"."""
+
+    text: str
+    """The line as it is given to the writer (without citations)."""
+
+    source_ids: List[int] = []
+    """Numbers of the sources cited by this item."""
+
+    score: float = 0.0
+    """Relevance to the query, from 0 to 1."""
+
+
+class PackedContext(BaseModel):
+    text: str
+    """The context block handed to the writer."""
+
+    budget: int
+    used_tokens: int
+    included: List[ContextItem]
+    dropped: List[ContextItem]
+
+    def summary_message(self) -> str:
+        message = f"Writer context: {len(self.included)} items, ~{self.used_tokens}/{self.budget} tokens"
+        if self.dropped:
+            message += f", dropped {len(self.dropped)} lower-relevance items"
+        return message
+
+
+def lexical_scores(query: str, texts: List[str], k1: float = 1.2, b: float = 0.75) -> List[float]:
+    """Relevance of each text to the query on an absolute 0-1 scale.
+
+    The fraction of query terms a text contains caps its score, so a weak match stays low even
+    when it is the best one; within that, BM25 (relative to the best text) orders the matches.
+    """
+    query_terms = tokenize(query)
+    documents = [tokenize(text) for text in texts]
+    if not query_terms or not documents:
+        return [0.0] * len(texts)
+
+    average_length = sum(len(document) for document in documents) / len(documents) or 1
+    frequency = Counter(term for document in documents for term in document)
+    bm25 = []
+    for document in documents:
+        score = 0.0
+        for term in query_terms & document:
+            idf = math.log(1 + (len(documents) - frequency[term] + 0.5) / (frequency[term] + 0.5))
+            # Token sets, so every matching term occurs once
+            score += idf * (k1 + 1) / (1 + k1 * (1 - b + b * len(document) / average_length))
+        bm25.append(score)
+    best = max(bm25)
+    return [
+        len(query_terms & document) / len(query_terms) * (0.5 + 0.5 * score / best) if best else 0.0
+        for document, score in zip(documents, bm25)
+    ]
+
+
+class ContextPacker:
+    """Fills the writer's token budget with the most relevant research material first.
+
+    Document summaries are ranked by their own `relevance_score`; search findings and summaries
+    by a local lexical score against the query (query term coverage and BM25), with a boost for
+    findings reported by several searches.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or int(os.environ.get("WRITER_CONTEXT_TOKENS", 8000))
+
+    def rank(self, findings: FindingsConsolidator) -> List[ContextItem]:
+        items: List[ContextItem] = []
+        for document in findings.documents:
+            text = f"{document.title}: {document.summary}"
+            if document.key_points:
+                text += " Key points: " + "; ".join(document.key_points)
+            items.append(ContextItem(kind="document", text=text, score=max(0.0, min(1.0, document.relevance_score))))
+
+        lexical: List[ContextItem] = [
+            ContextItem(kind="finding", text=finding.text, source_ids=finding.source_ids)
+            for finding in findings.findings
+        ] + [ContextItem(kind="summary", text=summary) for summary in findings.summaries]
+        scores = lexical_scores(findings.query, [item.text for item in lexical])
+        mentions = [finding.mentions for finding in findings.findings] + [1] * len(findings.summaries)
+        for item, score, count in zip(lexical, scores, mentions):
+            # Corroborated findings are worth more; keep the scale at 0..1
+            item.score = min(1.0, score * (1 + 0.25 * (count - 1)))
+        items.extend(lexical)
+
+        return sorted(items, key=lambda item: item.score, reverse=True)
+
+    def pack(self, findings: FindingsConsolidator) -> PackedContext:
+        header = f"Research findings for: {findings.query}\nItems are ordered by relevance to the query."
+        used = estimate_tokens(header)
+        included: List[ContextItem] = []
+        dropped: List[ContextItem] = []
+        cited: Dict[int, str] = {}
+
+        for item in self.rank(findings):
+            new_sources = {number: findings.sources[number - 1] for number in item.source_ids if number not in cited}
+            cost = estimate_tokens(item.text) + sum(estimate_tokens(source) for source in new_sources.values()) + 4
+            if used + cost > self.token_budget:
+                dropped.append(item)
+                continue
+            used += cost
+            included.append(item)
+            cited.update(new_sources)
+
+        lines = [header]
+        if cited:
+            lines.append("\nSources (cite by number):")
+            lines.extend(f"[{number}] {source}" for number, source in sorted(cited.items()))
+        sections = [("document", "Document summaries:"), ("finding", "Findings:"), ("summary", "Search summaries:")]
+        for kind, title in sections:
+            section = [item for item in included if item.kind == kind]
+            if section:
+                lines.append(f"\n{title}")
+                lines.extend(f"- {item.text} {cite(item.source_ids)}".rstrip() for item in section)
+        if dropped:
+            lines.append(f"\n({len(dropped)} lower-relevance items were omitted to stay within the context budget.)")
+
+        return PackedContext(
+            text="\n".join(lines),
+            budget=self.token_budget,
+            used_tokens=used,
+            included=included,
+            dropped=dropped,
+        )
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+from collections.abc import AsyncIterator
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from agents import ItemHelpers, Model, ModelBehaviorError, ModelResponse, ModelSettings, ModelTracing
+
+from backend.model_control import current_agent_name, estimate_tokens
+
+# The smaller model each model may be routed down to, and the model invalid outputs are escalated to
+SMALLER_TIER = {"gpt-4.1": "gpt-4.1-mini"}
+LARGER_TIER = {smaller: larger for larger, smaller in SMALLER_TIER.items()}
+
+# USD per million (input, output) tokens, for estimating what routing saved
+PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+ANALYTICAL_TERMS = {
+    "compare", "comparison", "versus", "vs", "tradeoff", "tradeoffs", "trade-offs", "evaluate", "analyze",
+    "analyse", "implications", "impact", "why", "pros", "cons", "history", "evolution", "future", "risks",
+}
+
+
+def query_complexity(query: str) -> float:
+    """Cheap 0-1 estimate of how demanding a research query is, from its length, parts and wording."""
+    words = re.findall(r"[\w'-]+", query.lower())
+    if not words:
+        return 0.0
+    length = min(1.0, len(words) / 40)
+    parts = min(1.0, (len(re.findall(r"[,;?]| and | or ", query.lower()))) / 4)
+    analytical = min(1.0, sum(1 for word in words if word in ANALYTICAL_TERMS) / 2)
+    return round(0.4 * length + 0.3 * parts + 0.3 * analytical, 3)
+
+
+def call_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = PRICES.get(model_name, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class JobProfile:
+    """What the router knows about the research job making a call."""
+
+    def __init__(self, query: str):
+        self.query = query
+        self.complexity = query_complexity(query)
+        # Orchestrator rounds of the research loop, counted by the manager
+        self.turn = 0
+
+
+# Profile of the research job running in the current task; calls outside a job are not routed
+current_job_profile: ContextVar[Optional[JobProfile]] = ContextVar("current_job_profile", default=None)
+
+
+class ModelRouter:
+    """Picks the model tier for each call from cheap local features.
+
+    Calls stay on the requested (larger) model for complex queries, the first orchestrator turn
+    (which interprets the query and decides on clarification), large inputs, and final reports
+    written from a lot of material. Everything else goes to the smaller tier, and is escalated to
+    the requested model if its output fails validation. Agents that already run on the smaller
+    tier are escalated to the larger one the same way.
+    """
+
+    def __init__(
+        self,
+        complexity_threshold: float = 0.6,
+        max_input_tokens: int = 6000,
+        max_final_input_tokens: int = 2500,
+        final_outputs: Optional[Set[str]] = None,
+    ):
+        self.complexity_threshold = complexity_threshold
+        self.max_input_tokens = max_input_tokens
+        self.max_final_input_tokens = max_final_input_tokens
+        self.final_outputs = final_outputs or {"ReportData"}
+        self.routes: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["ModelRouter"]:
+        if os.environ.get("MODEL_ROUTING", "1").lower() in ("0", "false", "off"):
+            return None
+        return cls(
+            complexity_threshold=float(os.environ.get("MODEL_ROUTING_COMPLEXITY", 0.6)),
+            max_input_tokens=int(os.environ.get("MODEL_ROUTING_MAX_INPUT_TOKENS", 6000)),
+            max_final_input_tokens=int(os.environ.get("MODEL_ROUTING_MAX_FINAL_INPUT_TOKENS", 2500)),
+        )
+
+    def can_route(self, model_name: Optional[str]) -> bool:
+        return model_name in SMALLER_TIER or model_name in LARGER_TIER
+
+    def choose(self, model_name: str, profile: Optional[JobProfile], input_tokens: int, final: bool) -> str:
+        smaller = SMALLER_TIER.get(model_name)
+        if smaller is None or profile is None or profile.complexity >= self.complexity_threshold:
+            return model_name
+        if final:
+            # Short reports don't need the large model
+            return smaller if input_tokens <= self.max_final_input_tokens else model_name
+        if profile.turn <= 1 or input_tokens > self.max_input_tokens:
+            return model_name
+        return smaller
+
+    def record(
+        self,
+        agent: str,
+        requested: str,
+        used: str,
+        seconds: float,
+        response: Optional[ModelResponse],
+        escalated: bool = False,
+        wasted_cost: float = 0.0,
+    ) -> None:
+        """Record a call's latency, and its cost compared to running it on the requested model."""
+        key = f"{agent}:{used}"
+        if key not in self.routes:
+            self.routes[key] = {
+                "agent": agent,
+                "model": used,
+                "calls": 0,
+                "escalations": 0,
+                "seconds": 0.0,
+                "cost": 0.0,
+                "saved": 0.0,
+            }
+        route = self.routes[key]
+        route["calls"] += 1
+        route["seconds"] += seconds
+        route["escalations"] += int(escalated)
+        if response is not None:
+            input_tokens, output_tokens = response.usage.input_tokens, response.usage.output_tokens
+            cost = call_cost(used, input_tokens, output_tokens) + wasted_cost
+            route["cost"] += cost
+            route["saved"] += call_cost(requested, input_tokens, output_tokens) - cost
+
+    def stats(self) -> Dict[str, Any]:
+        routes = [
+            {
+                **route,
+                "mean_latency": round(route["seconds"] / route["calls"], 3),
+                "seconds": round(route["seconds"], 3),
+                "cost": round(route["cost"], 6),
+                "saved": round(route["saved"], 6),
+            }
+            for route in self.routes.values()
+        ]
+        return {
+            "routes": routes,
+            "escalations": sum(route["escalations"] for route in routes),
+            "estimated_savings_usd": round(sum(route["saved"] for route in routes), 6),
+        }
+
+
+def _invalid_final_output(response: ModelResponse, output_schema) -> bool:
+    """Whether the response is meant as the agent's final output but doesn't match its schema."""
+    if output_schema is None or output_schema.is_plain_text():
+        return False
+    if any(getattr(item, "type", None) == "function_call" for item in response.output):
+        # Tool calls or handoffs; the runner won't treat this response as final output
+        return False
+    texts = [text for item in response.output if (text := ItemHelpers.extract_last_text(item)) is not None]
+    if not texts:
+        return False
+    try:
+        output_schema.validate_json(texts[-1])
+    except ModelBehaviorError:
+        return True
+    return False
+
+
+class RoutedModel(Model):
+    """Model that picks the tier per call with a ModelRouter."""
+
+    def __init__(self, model_name: str, get_model: Callable[..., Model], router: ModelRouter):
+        self.model_name = model_name
+        self.get_model = get_model
+        self.router = router
+
+    def _route(self, system_instructions, input, output_schema) -> str:
+        final = output_schema is not None and output_schema.name() in self.router.final_outputs
+        input_tokens = estimate_tokens(system_instructions) + estimate_tokens(input)
+        return self.router.choose(self.model_name, current_job_profile.get(), input_tokens, final)
+
+    async def get_response(
+        self,
+        system_instructions,
+        input,
+        model_settings: ModelSettings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing: ModelTracing,
+        *,
+        previous_response_id,
+    ) -> ModelResponse:
+        agent = current_agent_name() or "unknown"
+        chosen = self._route(system_instructions, input, output_schema)
+
+        async def respond(model_name: str, repeat: bool = False) -> ModelResponse:
+            return await self.get_model(model_name, repeat=repeat).get_response(
+                system_instructions,
+                input,
+                model_settings,
+                tools,
+                output_schema,
+                handoffs,
+                tracing,
+                previous_response_id=previous_response_id,
+            )
+
+        start = time.monotonic()
+        response = await respond(chosen)
+        escalate_to = self.model_name if chosen != self.model_name else LARGER_TIER.get(chosen)
+        if escalate_to is None or not _invalid_final_output(response, output_schema):
+            self.router.record(agent, self.model_name, chosen, time.monotonic() - start, response)
+            return response
+
+        # The smaller model's output doesn't validate: redo the call on the larger one
+        print(f"{agent} output from {chosen} failed validation, escalating to {escalate_to}")
+        wasted = call_cost(chosen, response.usage.input_tokens, response.usage.output_tokens)
+        # Same logical call, so it isn't counted again towards the hedge budget
+        response = await respond(escalate_to, repeat=True)
+        self.router.record(
+            agent, self.model_name, escalate_to, time.monotonic() - start, response,
+            escalated=True, wasted_cost=wasted,
+        )
+        return response
+
+    async def stream_response(
+        self,
+        system_instructions,
+        input,
+        model_settings: ModelSettings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing: ModelTracing,
+        *,
+        previous_response_id,
+    ) -> AsyncIterator[Any]:
+        # Streamed events can't be taken back, so streams are routed but never escalated
+        chosen = self._route(system_instructions, input, output_schema)
+        async for event in self.get_model(chosen).stream_response(
+            system_instructions,
+            input,
+            model_settings,
+            tools,
+            output_schema,
+            handoffs,
+            tracing,
+            previous_response_id=previous_response_id,
+        ):
+            yield event
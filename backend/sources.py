@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+from pydantic import BaseModel
+
+from backend.agents.document_agent import DocumentSummary
+from backend.agents.search_agent import SearchResult
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "ref_url", "referrer", "spm", "_ga", "_hsenc", "_hsmi",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "their", "this", "to", "was", "were", "which", "with",
+}
+
+URL_PATTERN = re.compile(r"https?://[^\s)\]>\"']+")
+
+
+def _is_tracking_param(key: str) -> bool:
+    key = key.lower()
+    return key.startswith("utm_") or key in TRACKING_PARAMS
+
+
+def strip_tracking_params(url: str) -> str:
+    """Remove tracking parameters from a URL, leaving everything else (scheme, port, encoding) as written."""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.query:
+        return url
+    kept = [param for param in parts.query.split("&") if not _is_tracking_param(unquote(param.split("=", 1)[0]))]
+    return urlunsplit(parts._replace(query="&".join(kept)))
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so the same page is recognised regardless of tracking parameters and formatting."""
+    url = url.strip().rstrip(".,;")
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        # Sources come from the model; a malformed URL (bad port, stray "[") is kept as written
+        return url
+    if parts.scheme not in ("http", "https") or not parts.netloc:
+        return url
+
+    host = parts.hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    )
+    path = parts.path.rstrip("/") or ""
+    return urlunsplit(("https", host, path, urlencode(query), ""))
+
+
+def source_key(source: str) -> str:
+    """Deduplication key for a source, which may be a bare URL or a title followed by a URL."""
+    match = URL_PATTERN.search(source)
+    if match:
+        return canonicalize_url(match.group(0))
+    return " ".join(source.lower().split())
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercased content words of a text."""
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS}
+
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    """Jaccard similarity of two token sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class Finding(BaseModel):
+    text: str
+    """The finding, as first reported."""
+
+    source_ids: List[int]
+    """Numbers of the sources in the consolidated source table that back this finding."""
+
+    mentions: int = 1
+    """How many searches reported this finding (or a near-identical one)."""
+
+
+class FindingsConsolidator:
+    """Merges the results of many searches into one numbered source table and a set of distinct findings.
+
+    Sources are deduplicated by canonical URL, and findings whose wording overlaps by at least
+    `similarity_threshold` (Jaccard over content words) are clustered into one.
+    """
+
+    def __init__(self, query: str = "", similarity_threshold: float = 0.6):
+        self.query = query
+        self.similarity_threshold = similarity_threshold
+        self.sources: List[str] = []
+        self.findings: List[Finding] = []
+        self.summaries: List[str] = []
+        self.documents: List[DocumentSummary] = []
+        # What the writer was given the last time it took over (see backend.packing)
+        self.last_packing = None
+        self._source_ids: Dict[str, int] = {}
+        self._finding_tokens: List[Set[str]] = []
+        self.raw_sources = 0
+        self.raw_findings = 0
+
+    def add_source(self, source: str) -> int:
+        """Number of the source in the table, adding it if it is new.
+
+        The canonical URL is only the deduplication key; the table shows the first-seen URL
+        without its tracking parameters, so links keep their scheme, port and encoding.
+        """
+        key = source_key(source)
+        if key not in self._source_ids:
+            display = source.strip()
+            match = URL_PATTERN.search(display)
+            if match:
+                url = match.group(0).rstrip(".,;")
+                display = display.replace(url, strip_tracking_params(url))
+            self.sources.append(display)
+            self._source_ids[key] = len(self.sources)
+        return self._source_ids[key]
+
+    def add_finding(self, text: str, source_ids: List[int]) -> Optional[Finding]:
+        """Add a finding, returning it if it is new, or None if it merged into an existing one."""
+        tokens = tokenize(text)
+        for finding, existing in zip(self.findings, self._finding_tokens):
+            if similarity(tokens, existing) >= self.similarity_threshold:
+                finding.mentions += 1
+                finding.source_ids = sorted(set(finding.source_ids) | set(source_ids))
+                return None
+        finding = Finding(text=text.strip(), source_ids=sorted(set(source_ids)))
+        self.findings.append(finding)
+        self._finding_tokens.append(tokens)
+        return finding
+
+    def add(self, result: SearchResult) -> List[Finding]:
+        """Merge one search result, returning the findings it added that no earlier search reported."""
+        self.raw_sources += len(result.sources)
+        self.raw_findings += len(result.key_findings)
+        self.summaries.append(result.summary)
+
+        source_ids = [self.add_source(source) for source in result.sources]
+        return [
+            finding for finding in (self.add_finding(text, source_ids) for text in result.key_findings)
+            if finding is not None
+        ]
+
+    def stats_message(self) -> str:
+        return (
+            f"Consolidated {self.raw_sources} sources into {len(self.sources)} unique and "
+            f"{self.raw_findings} findings into {len(self.findings)} distinct"
+        )
+
+    def add_document(self, document: DocumentSummary) -> None:
+        self.documents.append(document)
+
+
+def cite(source_ids: List[int]) -> str:
+    return "".join(f"[{number}]" for number in source_ids)
+
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from agents import Span, Trace, TracingProcessor
+from agents.tracing.span_data import (
+    AgentSpanData,
+    CustomSpanData,
+    FunctionSpanData,
+    GenerationSpanData,
+    HandoffSpanData,
+    ResponseSpanData,
+)
+
+# Span data values longer than this are truncated in the exported args
+MAX_ARG_CHARS = 500
+
+
+def _to_micros(timestamp: Optional[str]) -> Optional[float]:
+    """Convert an ISO timestamp from the agents SDK into epoch microseconds."""
+    if not timestamp:
+        return None
+    return datetime.fromisoformat(timestamp).timestamp() * 1_000_000
+
+
+def _span_name(span: Span[Any]) -> str:
+    """Human readable name for a span on the timeline."""
+    data = span.span_data
+    if isinstance(data, AgentSpanData):
+        return f"agent: {data.name}"
+    if isinstance(data, FunctionSpanData):
+        return f"tool: {data.name}"
+    if isinstance(data, HandoffSpanData):
+        return f"handoff: {data.from_agent} -> {data.to_agent}"
+    if isinstance(data, CustomSpanData):
+        return data.name
+    if isinstance(data, GenerationSpanData):
+        return f"generation: {data.model}"
+    if isinstance(data, ResponseSpanData):
+        return "model response"
+    return data.type
+
+
+def _span_args(span: Span[Any]) -> Dict[str, Any]:
+    """Span data as Chrome trace args, with large values truncated."""
+    args: Dict[str, Any] = {"span_id": span.span_id, "parent_id": span.parent_id}
+    try:
+        exported = span.span_data.export()
+    except Exception:
+        exported = {}
+    for key, value in exported.items():
+        if key == "type" or value is None:
+            continue
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) > MAX_ARG_CHARS:
+            text = text[:MAX_ARG_CHARS] + "..."
+        args[key] = text
+    if span.error:
+        args["error"] = span.error.get("message")
+    return args
+
+
+class ChromeTraceProcessor(TracingProcessor):
+    """Tracing processor that keeps a per-job timeline in memory.
+
+    Traces are matched to jobs through the `job_id` entry of the trace metadata, and each
+    timeline can be exported in the Chrome Trace Event format for viewing in Perfetto or
+    chrome://tracing.
+    """
+
+    def __init__(self, max_jobs: int = 200):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        # job_id -> {"name", "trace_id", "metadata", "spans": {span_id: event record}}
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._trace_to_job: Dict[str, str] = {}
+
+    def on_trace_start(self, trace: Trace) -> None:
+        metadata = getattr(trace, "metadata", None) or {}
+        job_id = metadata.get("job_id") or trace.trace_id
+        with self._lock:
+            self._jobs[job_id] = {
+                "name": trace.name,
+                "trace_id": trace.trace_id,
+                "metadata": dict(metadata),
+                "spans": {},
+            }
+            self._trace_to_job[trace.trace_id] = job_id
+            while len(self._jobs) > self.max_jobs:
+                _, evicted = self._jobs.popitem(last=False)
+                self._trace_to_job.pop(evicted["trace_id"], None)
+
+    def on_trace_end(self, trace: Trace) -> None:
+        pass
+
+    def on_span_start(self, span: Span[Any]) -> None:
+        # Args are only read once the span has ended, when its data is complete
+        self._record(span, {"span_id": span.span_id, "parent_id": span.parent_id})
+
+    def on_span_end(self, span: Span[Any]) -> None:
+        self._record(span, _span_args(span))
+
+    def _record(self, span: Span[Any], args: Dict[str, Any]) -> None:
+        """Keep what the export needs, not the span itself: its data holds whole model inputs and outputs."""
+        with self._lock:
+            job_id = self._trace_to_job.get(span.trace_id)
+            if job_id is None:
+                return
+        record = {
+            "name": _span_name(span),
+            "cat": span.span_data.type,
+            "start": _to_micros(span.started_at),
+            "end": _to_micros(span.ended_at),
+            "args": args,
+        }
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["spans"][span.span_id] = record
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._jobs.clear()
+            self._trace_to_job.clear()
+
+    def force_flush(self) -> None:
+        pass
+
+    def has_job(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._jobs
+
+    def export_chrome_trace(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the timeline of a job as a Chrome Trace Event JSON object."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            spans = list(job["spans"].values())
+            name = job["name"]
+            metadata = job["metadata"]
+
+        now = datetime.now(timezone.utc).timestamp() * 1_000_000
+        events: List[Dict[str, Any]] = []
+        for record in spans:
+            start, end = record["start"], record["end"]
+            if start is None:
+                continue
+            args = dict(record["args"])
+            if end is None:
+                # Still running, draw it up to the time of the export
+                args["unfinished"] = True
+                end = now
+            events.append({
+                "name": record["name"],
+                "cat": record["cat"],
+                "ph": "X",
+                "ts": start,
+                "dur": max(end - start, 0),
+                "pid": 1,
+                "args": args,
+            })
+
+        self._assign_lanes(events)
+
+        lanes = {event["tid"] for event in events}
+        metadata_events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": name}}
+        ]
+        for tid in sorted(lanes):
+            metadata_events.append(
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": f"lane {tid}"}}
+            )
+
+        return {
+            "traceEvents": metadata_events + events,
+            "displayTimeUnit": "ms",
+            "otherData": {"job_id": job_id, "trace_id": job["trace_id"], **metadata},
+        }
+
+    @staticmethod
+    def _assign_lanes(events: List[Dict[str, Any]]) -> None:
+        """Spread overlapping spans over lanes (tids) so that each lane nests correctly."""
+        # Each lane is a stack of end timestamps of the spans currently open on it
+        lanes: List[List[float]] = []
+        for event in sorted(events, key=lambda e: (e["ts"], -e["dur"])):
+            end = event["ts"] + event["dur"]
+            for tid, stack in enumerate(lanes):
+                while stack and stack[-1] <= event["ts"]:
+                    stack.pop()
+                if not stack or end <= stack[-1]:
+                    stack.append(end)
+                    event["tid"] = tid
+                    break
+            else:
+                lanes.append([end])
+                event["tid"] = len(lanes) - 1
@@ -0,0 +1,219 @@
+"""Local stand-in for the OpenAI Responses API, for exercising the backend without a real provider.
+
+It answers `POST /v1/responses` with schema-valid structured outputs, drives the orchestrator
+through a few searches before handing off to the writer, and can inject latency, slow outliers, 429s and invalid outputs from small models.
+
+Usage:
+    python benchmarks/fake_model_server.py --port 8001 --latency 0.5 --error-rate 0.1
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake uvicorn api:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Behaviour of the fake provider, overridden from the command line
+config: Dict[str, Any] = {
+    "latency": 0.2,  # mean latency of a call in seconds
+    "jitter": 0.5,  # latency varies by +/- this fraction
+    "error_rate": 0.0,  # fraction of calls answered with a 429
+    "retry_after": 1.0,  # retry-after sent with the 429s
+    "tail_rate": 0.0,  # fraction of calls that are slow
+    "tail_latency": 5.0,  # latency of the slow calls in seconds
+    "mini_invalid_rate": 0.0,  # fraction of structured outputs from -mini models that don't match the schema
+    "searches": 3,  # searches the orchestrator asks for before writing the report
+}
+
+stats: Dict[str, int] = {"calls": 0, "rate_limited": 0}
+
+app = FastAPI()
+
+WORDS = (
+    "agents research latency throughput model provider search source finding report context "
+    "evidence benchmark system concurrency cache token budget query analysis result"
+).split()
+
+SOURCES = [
+    "https://example.com/articles/agents?utm_source=newsletter",
+    "https://www.example.org/research/latency/",
+    "https://docs.example.net/guide#section-2",
+    "https://example.com/articles/agents?ref=homepage",
+    "https://blog.example.io/posts/concurrency?fbclid=abc123",
+]
+
+
+def _sentence(words: int = 12) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _fake_value(schema: Dict[str, Any], defs: Dict[str, Any], name: str = "") -> Any:
+    """Produce a value that satisfies a (strict) JSON schema, using the field name as a hint."""
+    if "$ref" in schema:
+        return _fake_value(defs[schema["$ref"].split("/")[-1]], defs, name)
+    if "anyOf" in schema:
+        # Prefer null for optional fields (e.g. no clarification request)
+        options = schema["anyOf"]
+        if any(option.get("type") == "null" for option in options):
+            return None
+        return _fake_value(options[0], defs, name)
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            key: _fake_value(value, defs, key)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        if name == "sources":
+            return random.sample(SOURCES, 3)
+        return [_fake_value(schema.get("items", {}), defs, name) for _ in range(3)]
+    if kind == "number":
+        return round(random.random(), 2)
+    if kind == "integer":
+        return random.randint(0, 10)
+    if kind == "boolean":
+        return False
+    if name == "report":
+        return "\n\n".join(f"## Section {i}\n\n" + " ".join(_sentence() for _ in range(6)) for i in range(1, 4))
+    return _sentence()
+
+
+def _count_completed_steps(items: Any) -> int:
+    """Number of sub-agent results the manager has fed back to the orchestrator."""
+    if not isinstance(items, list):
+        return 0
+    return sum(
+        1
+        for item in items
+        if isinstance(item.get("content"), str)
+        and item["content"].startswith("Continue with the research given the output of")
+    )
+
+
+def _output_item(body: Dict[str, Any]) -> Dict[str, Any]:
+    tool_names: List[str] = [tool.get("name", "") for tool in body.get("tools", []) if tool.get("type") == "function"]
+    handoffs = [name for name in tool_names if name.startswith("transfer_to_") and name != "transfer_to_orchestratoragent"]
+
+    # The orchestrator is the only agent with handoffs to other agents
+    if handoffs:
+        if _count_completed_steps(body.get("input")) < config["searches"] or "transfer_to_writeragent" not in handoffs:
+            target = "transfer_to_searchagent" if "transfer_to_searchagent" in handoffs else handoffs[0]
+        else:
+            target = "transfer_to_writeragent"
+        return {
+            "type": "function_call",
+            "id": f"fc_{uuid.uuid4().hex}",
+            "call_id": f"call_{uuid.uuid4().hex}",
+            "name": target,
+            "arguments": "{}",
+            "status": "completed",
+        }
+
+    # The writer reads one record from the research index before writing, like a real model would
+    items = body.get("input")
+    if "read_records" in tool_names and isinstance(items, list) and not any(item.get("name") == "read_records" for item in items):
+        return {
+            "type": "function_call",
+            "id": f"fc_{uuid.uuid4().hex}",
+            "call_id": f"call_{uuid.uuid4().hex}",
+            "name": "read_records",
+            "arguments": json.dumps({"ids": ["S1"]}),
+            "status": "completed",
+        }
+
+    text_format = (body.get("text") or {}).get("format") or {}
+    if text_format.get("type") == "json_schema":
+        schema = text_format["schema"]
+        text = json.dumps(_fake_value(schema, schema.get("$defs", {})))
+        if body.get("model", "").endswith("-mini") and random.random() < config["mini_invalid_rate"]:
+            text = text[: len(text) // 2]
+    else:
+        text = _sentence(30)
+    return {
+        "type": "message",
+        "id": f"msg_{uuid.uuid4().hex}",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": text, "annotations": []}],
+    }
+
+
+@app.post("/v1/responses")
+async def create_response(request: Request):
+    body = await request.json()
+    stats["calls"] += 1
+
+    latency = config["latency"] * random.uniform(1 - config["jitter"], 1 + config["jitter"])
+    if random.random() < config["tail_rate"]:
+        latency = config["tail_latency"]
+    await asyncio.sleep(max(latency, 0))
+
+    if random.random() < config["error_rate"]:
+        stats["rate_limited"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (injected)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": str(config["retry_after"])},
+        )
+
+    output = _output_item(body)
+    input_tokens = len(json.dumps(body.get("input", ""))) // 4 + 1
+    output_tokens = len(json.dumps(output)) // 4 + 1
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": time.time(),
+        "status": "completed",
+        "model": body.get("model", "fake"),
+        "output": [output],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI Responses API with injected latency and 429s")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=config["latency"])
+    parser.add_argument("--jitter", type=float, default=config["jitter"])
+    parser.add_argument("--error-rate", type=float, default=config["error_rate"])
+    parser.add_argument("--retry-after", type=float, default=config["retry_after"])
+    parser.add_argument("--tail-rate", type=float, default=config["tail_rate"])
+    parser.add_argument("--tail-latency", type=float, default=config["tail_latency"])
+    parser.add_argument("--mini-invalid-rate", type=float, default=config["mini_invalid_rate"])
+    parser.add_argument("--searches", type=int, default=config["searches"])
+    args = parser.parse_args()
+
+    config.update(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+        mini_invalid_rate=args.mini_invalid_rate,
+        searches=args.searches,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
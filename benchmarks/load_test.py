@@ -0,0 +1,252 @@
+"""Load test for api.py: simulated WebSocket clients against a fake model provider.
+
+Starts the fake model provider and `uvicorn api:app`, opens one or more WebSockets ("tabs") per
+simulated session, submits research jobs at a configured rate (Poisson arrivals), and reports
+progress-event latency, completion latency, memory growth of the API process and error rates.
+
+Usage:
+    python benchmarks/load_test.py --sessions 50 --jobs 200 --rate 5 --multi-tab-fraction 0.3 --tabs 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+from startup import ROOT, free_port, wait_until_ready
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None}
+    if len(samples) == 1:
+        return {"p50": samples[0], "p95": samples[0], "p99": samples[0]}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p95": cuts[94], "p99": cuts[98]}
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args: argparse.Namespace):
+        self.base_url = base_url
+        self.args = args
+        self.arrivals: asyncio.Queue = asyncio.Queue()
+        self.event_latencies: List[float] = []
+        self.completion_latencies: List[float] = []
+        self.counts = {"submitted": 0, "completed": 0, "job_errors": 0, "timeouts": 0, "request_errors": 0, "socket_errors": 0}
+
+    async def feed_arrivals(self) -> None:
+        for _ in range(self.args.jobs):
+            await self.arrivals.put(time.perf_counter())
+            await asyncio.sleep(random.expovariate(self.args.rate))
+        for _ in range(self.args.sessions):
+            await self.arrivals.put(None)
+
+    async def read_tab(self, websocket, done: asyncio.Queue) -> None:
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if "sent_at" in message:
+                    self.event_latencies.append(time.time() - message["sent_at"])
+                if message["type"] == "complete":
+                    done.put_nowait(("complete", message.get("sent_at", 0.0)))
+                elif message.get("item") == "error":
+                    done.put_nowait(("error", message.get("sent_at", 0.0)))
+        except websockets.ConnectionClosed:
+            pass
+        except Exception:
+            self.counts["socket_errors"] += 1
+
+    @staticmethod
+    async def job_outcome(done: asyncio.Queue, submitted_at: float) -> str:
+        """First outcome sent for the job submitted at `submitted_at`.
+
+        Every tab reports the same completion, so the other tabs' copies of an earlier job's
+        outcome can still be queued; they were sent before this job was submitted and are skipped.
+        """
+        while True:
+            outcome, sent_at = await done.get()
+            if sent_at >= submitted_at:
+                return outcome
+
+    async def run_session(self, client: httpx.AsyncClient) -> None:
+        session_id = str(uuid.uuid4())
+        tabs = self.args.tabs if random.random() < self.args.multi_tab_fraction else 1
+        ws_url = self.base_url.replace("http", "ws", 1) + f"/ws/{session_id}"
+        try:
+            sockets = [await websockets.connect(ws_url) for _ in range(tabs)]
+        except Exception:
+            self.counts["socket_errors"] += 1
+            return
+
+        # Every tab reports into the same queue; the first completion sent after submission finishes the job
+        done: asyncio.Queue = asyncio.Queue()
+        readers = [asyncio.create_task(self.read_tab(websocket, done)) for websocket in sockets]
+        try:
+            while (scheduled := await self.arrivals.get()) is not None:
+                self.counts["submitted"] += 1
+                submitted_at = time.time()
+                try:
+                    response = await client.post(
+                        f"{self.base_url}/api/research",
+                        json={"text": f"load test query {uuid.uuid4().hex[:8]}", "session_id": session_id},
+                    )
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    self.counts["request_errors"] += 1
+                    continue
+                try:
+                    outcome = await asyncio.wait_for(self.job_outcome(done, submitted_at), timeout=self.args.job_timeout)
+                except asyncio.TimeoutError:
+                    self.counts["timeouts"] += 1
+                    continue
+                if outcome == "complete":
+                    self.counts["completed"] += 1
+                    # Measured from the scheduled arrival, so queueing at the client counts too
+                    self.completion_latencies.append(time.perf_counter() - scheduled)
+                else:
+                    self.counts["job_errors"] += 1
+        finally:
+            for websocket in sockets:
+                await websocket.close()
+            for reader in readers:
+                reader.cancel()
+
+    async def run(self) -> None:
+        limits = httpx.Limits(max_connections=self.args.sessions)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            sessions = [asyncio.create_task(self.run_session(client)) for _ in range(self.args.sessions)]
+            await self.feed_arrivals()
+            await asyncio.gather(*sessions)
+
+
+async def sample_memory(pid: int, samples: List[float], interval: float = 0.5) -> None:
+    while True:
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        await asyncio.sleep(interval)
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_port, api_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "LOCAL_TRACING_ONLY": "1",
+    }
+    fake = subprocess.Popen(
+        [
+            sys.executable, "benchmarks/fake_model_server.py", "--port", str(fake_port),
+            "--latency", str(args.fake_latency), "--error-rate", str(args.fake_error_rate),
+            "--retry-after", "0.2",
+        ],
+        cwd=ROOT,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--port", str(api_port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{api_port}"
+    memory: List[float] = []
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{fake_port}/stats")
+        await wait_until_ready(f"{base_url}/api/stats")
+        sampler = asyncio.create_task(sample_memory(server.pid, memory))
+
+        load_test = LoadTest(base_url, args)
+        start = time.perf_counter()
+        await load_test.run()
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+        async with httpx.AsyncClient() as client:
+            api_stats = (await client.get(f"{base_url}/api/stats")).json()
+            provider_stats = (await client.get(f"http://127.0.0.1:{fake_port}/stats")).json()
+    finally:
+        for process in (server, fake):
+            process.terminate()
+            process.wait()
+
+    counts = load_test.counts
+    failed = counts["job_errors"] + counts["timeouts"] + counts["request_errors"]
+    return {
+        "config": vars(args),
+        "elapsed": elapsed,
+        "counts": counts,
+        "error_rate": failed / counts["submitted"] if counts["submitted"] else 0.0,
+        "throughput_per_min": counts["completed"] / elapsed * 60,
+        "event_latency_ms": {key: value * 1000 if value is not None else None for key, value in percentiles(load_test.event_latencies).items()},
+        "completion_latency_s": percentiles(load_test.completion_latencies),
+        "memory_mb": {
+            "start": memory[0] if memory else None,
+            "peak": max(memory) if memory else None,
+            "end": memory[-1] if memory else None,
+            "growth": memory[-1] - memory[0] if memory else None,
+        },
+        "provider": provider_stats,
+        "api": api_stats,
+    }
+
+
+def _format(value: Optional[float], unit: str) -> str:
+    return f"{value:.1f}{unit}" if value is not None else "n/a"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test api.py with simulated WebSocket clients")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated sessions")
+    parser.add_argument("--jobs", type=int, default=100, help="total research jobs to submit")
+    parser.add_argument("--rate", type=float, default=5.0, help="job arrival rate (jobs/second)")
+    parser.add_argument("--tabs", type=int, default=3, help="WebSockets opened by multi-tab sessions")
+    parser.add_argument("--multi-tab-fraction", type=float, default=0.25, help="fraction of sessions with several tabs")
+    parser.add_argument("--job-timeout", type=float, default=120.0, help="seconds before a job counts as timed out")
+    parser.add_argument("--fake-latency", type=float, default=0.3, help="mean latency of the fake model provider")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0, help="fraction of model calls answered with 429")
+    parser.add_argument("--json", help="also write the full results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    counts = results["counts"]
+    events, completion, memory = results["event_latency_ms"], results["completion_latency_s"], results["memory_mb"]
+    print(f"Jobs: {counts['submitted']} submitted, {counts['completed']} completed, {counts['job_errors']} failed, "
+          f"{counts['timeouts']} timed out, {counts['request_errors']} request errors, {counts['socket_errors']} socket errors")
+    print(f"Error rate: {results['error_rate'] * 100:.1f}%  Throughput: {results['throughput_per_min']:.1f} jobs/min "
+          f"over {results['elapsed']:.1f}s")
+    print("Progress event latency: " + "  ".join(f"{key} {_format(value, 'ms')}" for key, value in events.items()))
+    print("Completion latency:     " + "  ".join(f"{key} {_format(value, 's')}" for key, value in completion.items()))
+    print(f"API memory: start {_format(memory['start'], 'MB')}  peak {_format(memory['peak'], 'MB')}  "
+          f"end {_format(memory['end'], 'MB')}  growth {_format(memory['growth'], 'MB')}")
+    print(f"Model calls: {results['provider'].get('calls')} ({results['provider'].get('rate_limited')} answered with 429)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Startup benchmark: import time of the API and latency of the first research request.
+
+Starts the fake model provider and `uvicorn api:app` in subprocesses, then measures how long the
+server takes to become ready and how long the first (cold) and second (warm) research jobs take.
+
+Usage:
+    python benchmarks/startup.py --repeats 5 --json startup_history.jsonl
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Dict
+
+import httpx
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(module: str, repeats: int) -> float:
+    """Median time to import a module in a fresh interpreter, in seconds."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+async def wait_until_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.perf_counter() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.02)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+
+async def research_latency(base_url: str) -> Dict[str, float]:
+    """Run one research job, timing the first progress event and the completion."""
+    session_id = str(uuid.uuid4())
+    ws_url = base_url.replace("http", "ws", 1) + f"/ws/{session_id}"
+    async with websockets.connect(ws_url) as websocket, httpx.AsyncClient() as client:
+        start = time.perf_counter()
+        await client.post(f"{base_url}/api/research", json={"text": "startup benchmark", "session_id": session_id})
+        first_event = None
+        while True:
+            message = json.loads(await websocket.recv())
+            if first_event is None:
+                first_event = time.perf_counter() - start
+            if message["type"] == "complete" or message.get("item") == "error":
+                break
+    return {"first_event": first_event, "complete": time.perf_counter() - start}
+
+
+async def measure_server(fake_latency: float) -> Dict[str, float]:
+    fake_port, api_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "OPENAI_API_KEY": "fake",
+        "LOCAL_TRACING_ONLY": "1",
+    }
+    fake = subprocess.Popen(
+        [sys.executable, "benchmarks/fake_model_server.py", "--port", str(fake_port), "--latency", str(fake_latency)],
+        cwd=ROOT,
+    )
+    server = None
+    try:
+        await wait_until_ready(f"http://127.0.0.1:{fake_port}/stats")
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(api_port), "--log-level", "warning"],
+            cwd=ROOT,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        base_url = f"http://127.0.0.1:{api_port}"
+        await wait_until_ready(f"{base_url}/api/stats")
+        ready = time.perf_counter() - start
+
+        cold = await research_latency(base_url)
+        warm = await research_latency(base_url)
+        return {
+            "server_ready": ready,
+            "first_request_first_event": cold["first_event"],
+            "first_request_complete": cold["complete"],
+            "warm_request_first_event": warm["first_event"],
+            "warm_request_complete": warm["complete"],
+        }
+    finally:
+        for process in (server, fake):
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure import time and first-request latency of the API")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per import measurement")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="latency of the fake model provider")
+    parser.add_argument("--json", help="append the results as one JSON line to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, float] = {
+        "import_api": measure_import("api", args.repeats),
+        "import_manager": measure_import("backend.manager", args.repeats),
+    }
+    results.update(asyncio.run(measure_server(args.fake_latency)))
+
+    width = max(len(name) for name in results)
+    for name, seconds in results.items():
+        print(f"{name:<{width}}  {seconds * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "a") as f:
+            f.write(json.dumps({"timestamp": datetime.now().isoformat(), **results}) + "\n")
+
+
+if __name__ == "__main__":
+    main()